@@ -0,0 +1,150 @@
+"""
+On-disk cache for parsed sales data and analysis results.
+
+Entries are keyed on the content of the source file (or its size and
+modification time) plus the analysis parameters, pickled to a cache
+directory, and evicted least-recently-used first once the directory grows
+past a size limit.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = '.analysis_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class AnalysisCache:
+    """
+    Size-bounded LRU cache of analysis artifacts stored as pickle files.
+
+    Args:
+        cache_dir (str): Directory holding the cache entries.
+        max_bytes (int): Total size the directory is trimmed back to after each write.
+        key_mode (str): 'hash' keys on a BLAKE2 digest of the file content;
+            'stat' keys on path, size and modification time, which avoids
+            reading the file at all but trusts the filesystem metadata.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, key_mode='hash'):
+        if key_mode not in ('hash', 'stat'):
+            raise ValueError(f"Unknown cache key mode: {key_mode}")
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def file_key(self, file_path):
+        """
+        Identifies the current contents of a file.
+
+        Args:
+            file_path (str): Source data file.
+
+        Returns:
+            str: Hex digest that changes whenever the file does.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        if self.key_mode == 'stat':
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+        else:
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def key(self, file_key, **params):
+        """
+        Combines a file key with analysis parameters into an entry key.
+
+        Args:
+            file_key (str): Result of file_key.
+            **params: JSON-serializable parameters that affect the artifact.
+
+        Returns:
+            str: Entry key.
+        """
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.blake2b(f"{file_key}|{payload}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key):
+        """
+        Loads a cached artifact, marking it as recently used.
+
+        Args:
+            key (str): Entry key.
+
+        Returns:
+            The cached object, or None when there is no usable entry.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            # Truncated, or pickled by code that has since changed: drop it and recompute
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since the load; the value is still good
+            pass
+        return value
+
+    def put(self, key, value):
+        """
+        Stores an artifact, then evicts the least recently used entries over the size limit.
+
+        Args:
+            key (str): Entry key.
+            value: Picklable object to store.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob('*.pkl'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        # The most recent entry is always kept, even if it alone exceeds the limit
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Deletes every entry."""
+        for path in self.cache_dir.glob('*.pkl'):
+            path.unlink(missing_ok=True)
@@ -1,64 +1,1088 @@
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-def analyze_product_performance(file_path):
+import profiling
+from analysis_cache import DEFAULT_CACHE_DIR, AnalysisCache
+from profiling import span, timed_iter
+
+# Period columns identifying each reporting granularity
+PERIOD_KEYS = {
+    'Year': ['Year'],
+    'Quarter': ['Year', 'Quarter'],
+    'Month': ['Year', 'Month'],
+}
+
+# Text columns of the sales schemas; everything else besides Date is numeric
+TEXT_COLUMNS = {'Product', 'Category', 'Region', 'Country', 'State', 'City', 'Channel'}
+
+# Rows per chunk when streaming a file that may not fit in memory
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Date layouts seen in the sample corpus (ISO and US month-first first), tried in order
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%m-%d-%Y', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S']
+
+# Measures computed from other columns: name -> (minuend, subtrahend)
+DERIVED_MEASURES = {'Variance': ('Actuals', 'Budget')}
+
+# File types picked up when a directory is analyzed in batch mode
+SALES_FILE_SUFFIXES = ('.csv', '.parquet', '.feather')
+
+# Rankings use a dense (period x member) matrix while it has at most this many cells per aggregated row
+DENSE_RANKING_FILL = 4
+
+# Report heading printed for each granularity
+PERIOD_HEADINGS = {
+    'Year': "--- Analysis by Year ---",
+    'Quarter': "--- Analysis by Quarter ---",
+    'Month': "--- Analysis by Month ---",
+}
+
+@dataclass
+class ProductPerformance:
+    """
+    Top and bottom products for every year, quarter and month of a dataset.
+
+    Attributes:
+        monthly (pd.DataFrame): Actuals per (Year, Month, Product), the grain
+            every other period is rolled up from.
+        rankings (pd.DataFrame): One row per period with columns Granularity,
+            Period, Year, Quarter, Month, Top, Top_Amount, Top_Percentage,
+            Bottom, Bottom_Amount and Bottom_Percentage. Quarter and Month
+            are null where they do not apply.
+    """
+    monthly: pd.DataFrame
+    rankings: pd.DataFrame
+
+    def periods(self, granularity):
+        """Returns the ranking rows for one granularity ('Year', 'Quarter' or 'Month')."""
+        return self.rankings[self.rankings['Granularity'] == granularity].reset_index(drop=True)
+
+    def to_records(self):
+        """Returns the rankings as a list of JSON-compatible dicts."""
+        return json.loads(self.rankings.to_json(orient='records'))
+
+    def to_json(self, path=None):
+        """Serializes the rankings to JSON, writing them to path when given."""
+        text = self.rankings.to_json(orient='records', indent=2)
+        if path is not None:
+            Path(path).write_text(text, encoding='utf-8')
+        return text
+
+    def to_parquet(self, path):
+        """Writes the rankings to a Parquet file (requires pyarrow)."""
+        self.rankings.to_parquet(path, index=False)
+
+def detect_date_format(values):
     """
-    Analyzes product performance from a CSV file, identifying top and bottom products
-    by year, quarter, and month.
+    Finds the first entry of DATE_FORMATS that parses every given date string.
 
     Args:
-        file_path (str): The path to the CSV file.
+        values (array-like): Distinct date strings to check.
+
+    Returns:
+        str or None: The matching format, or None if no fixed format fits.
     """
-    df = pd.read_csv(file_path)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Year'] = df['Date'].dt.year
-    df['Quarter'] = df['Date'].dt.quarter
-    df['Month'] = df['Date'].dt.month
+    sample = pd.Index(values).dropna()
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors='coerce').notna().all():
+            return date_format
+    return None
 
-    def get_top_bottom_products(grouped_df):
+class DateParser:
+    """
+    Parses date columns with a fixed format detected once per source.
+
+    Each distinct date string is parsed a single time and broadcast back to
+    the rows that use it, so a column of millions of rows spanning a few
+    hundred days costs a few hundred parses. The detected format is kept
+    for later chunks of the same file. Values it does not match fall back
+    to per-value parsing rather than to another fixed format, so one file
+    is never read as month-first in some chunks and day-first in others.
+
+    Args:
+        date_format (str): Known strptime format; detected from the data when None.
+    """
+
+    def __init__(self, date_format=None):
+        self.date_format = date_format
+
+    def parse(self, values):
         """
-        Calculates top and bottom products from a grouped DataFrame.
+        Parses a column of date strings.
 
         Args:
-            grouped_df (pd.DataFrame): DataFrame grouped by a time period.
+            values (pd.Series): Date strings (missing values become NaT).
 
         Returns:
-            tuple: A tuple containing the top and bottom product series.
+            pd.Series: datetime64 values with the same index.
         """
-        total_actuals = grouped_df['Actuals'].sum()
-        grouped_df['Percentage'] = (grouped_df['Actuals'] / total_actuals) * 100
-        top_product = grouped_df.loc[grouped_df['Actuals'].idxmax()]
-        bottom_product = grouped_df.loc[grouped_df['Actuals'].idxmin()]
-        return top_product, bottom_product
-
-    # --- Year ---
-    print("--- Analysis by Year ---")
-    yearly_groups = df.groupby(['Year', 'Product']).agg({'Actuals': 'sum'}).reset_index()
-    for year, group in yearly_groups.groupby('Year'):
-        print(f"\nYear: {year}")
-        top, bottom = get_top_bottom_products(group)
-        print(f"  Top Product: {top['Product']} - Amount: ${top['Actuals']:,.2f}, Percentage: {top['Percentage']:.2f}%")
-        print(f"  Bottom Product: {bottom['Product']} - Amount: ${bottom['Actuals']:,.2f}, Percentage: {bottom['Percentage']:.2f}%")
-
-
-    # --- Quarter ---
-    print("\n--- Analysis by Quarter ---")
-    quarterly_groups = df.groupby(['Year', 'Quarter', 'Product']).agg({'Actuals': 'sum'}).reset_index()
-    for (year, quarter), group in quarterly_groups.groupby(['Year', 'Quarter']):
-        print(f"\nQuarter: Q{quarter} {year}")
-        top, bottom = get_top_bottom_products(group)
-        print(f"  Top Product: {top['Product']} - Amount: ${top['Actuals']:,.2f}, Percentage: {top['Percentage']:.2f}%")
-        print(f"  Bottom Product: {bottom['Product']} - Amount: ${bottom['Actuals']:,.2f}, Percentage: {bottom['Percentage']:.2f}%")
-
-
-    # --- Month ---
-    print("\n--- Analysis by Month ---")
-    monthly_groups = df.groupby(['Year', 'Month', 'Product']).agg({'Actuals': 'sum'}).reset_index()
-    for (year, month), group in monthly_groups.groupby(['Year', 'Month']):
-        print(f"\nMonth: {month}/{year}")
-        top, bottom = get_top_bottom_products(group)
-        print(f"  Top Product: {top['Product']} - Amount: ${top['Actuals']:,.2f}, Percentage: {top['Percentage']:.2f}%")
-        print(f"  Bottom Product: {bottom['Product']} - Amount: ${bottom['Actuals']:,.2f}, Percentage: {bottom['Percentage']:.2f}%")
+        codes, uniques = pd.factorize(values)
+        if self.date_format is None:
+            self.date_format = detect_date_format(uniques)
+
+        if self.date_format is None:
+            parsed = pd.to_datetime(uniques, format='mixed').to_numpy()
+        else:
+            parsed = pd.to_datetime(uniques, format=self.date_format, errors='coerce').to_numpy().copy()
+            unmatched = np.isnat(parsed)
+            if unmatched.any():
+                parsed[unmatched] = pd.to_datetime(uniques[unmatched], format='mixed').to_numpy()
+
+        # Code -1 (missing) picks the trailing NaT
+        lookup = np.append(parsed, np.datetime64('NaT'))
+        return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+def load_sales_data(file_path):
+    """
+    Loads a sales dataset into a DataFrame with a datetime 'Date' column.
+
+    Parquet and Feather files (as written by generate_sample_data.py --format)
+    already carry typed columns, so only CSV input pays for text and date parsing.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+
+    Returns:
+        pd.DataFrame: The loaded data.
+    """
+    suffix = Path(file_path).suffix.lower()
+    with span('read_file'):
+        if suffix == '.parquet':
+            df = pd.read_parquet(file_path)
+        elif suffix == '.feather':
+            df = pd.read_feather(file_path)
+        else:
+            df = pd.read_csv(file_path)
+
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        with span('parse_dates'):
+            df['Date'] = DateParser().parse(df['Date'])
+    return df
+
+def iter_sales_chunks(file_path, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Streams selected columns of a sales file as DataFrames of at most chunk_rows rows.
+
+    CSV chunks are read with usecols and explicit dtypes (text dimensions as
+    strings, numeric measures as float64); Parquet and Feather are read batch
+    by batch. 'Date' is always returned as datetime.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        columns (list): Columns to read; must include 'Date'.
+        chunk_rows (int): Maximum rows per chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk.
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix in ('.parquet', '.feather'):
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        if suffix == '.parquet':
+            parquet_file = pq.ParquetFile(file_path)
+            batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=columns)
+        else:
+            batches = feather.read_table(file_path, columns=columns, memory_map=True).to_batches(max_chunksize=chunk_rows)
+        for batch in timed_iter(batches, 'read_chunk'):
+            chunk = batch.to_pandas()
+            if not pd.api.types.is_datetime64_any_dtype(chunk['Date']):
+                with span('parse_dates'):
+                    chunk['Date'] = DateParser().parse(chunk['Date'])
+            yield chunk
+        return
+
+    dtypes = {column: str if column in TEXT_COLUMNS else 'float64' for column in columns if column != 'Date'}
+    date_parser = DateParser()
+    reader = pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunk_rows)
+    for chunk in timed_iter(reader, 'read_chunk'):
+        with span('parse_dates'):
+            chunk['Date'] = date_parser.parse(chunk['Date'])
+        yield chunk
+
+def measure_columns(measure):
+    """
+    Lists the source columns a measure is computed from.
+
+    Args:
+        measure (str): A numeric column, or a key of DERIVED_MEASURES.
+
+    Returns:
+        list: Column names to read.
+    """
+    return list(DERIVED_MEASURES.get(measure, (measure,)))
+
+def measure_values(df, measure):
+    """
+    Returns the values of a stored or derived measure.
+
+    Args:
+        df (pd.DataFrame): Rows holding the measure_columns of the measure.
+        measure (str): A numeric column, or a key of DERIVED_MEASURES.
+
+    Returns:
+        pd.Series: The measure, named after it.
+    """
+    if measure in DERIVED_MEASURES:
+        minuend, subtrahend = DERIVED_MEASURES[measure]
+        return (df[minuend] - df[subtrahend]).rename(measure)
+    return df[measure]
+
+def aggregate_by_month(df, dimension='Product', measure='Actuals'):
+    """
+    Aggregates a measure once, at the finest reporting grain (Year, Month, dimension).
+
+    Coarser periods are rolled up from this table with roll_up, so the raw rows
+    are scanned a single time.
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        dimension (str): Column to break the measure down by.
+        measure (str): Numeric column to sum, or a key of DERIVED_MEASURES.
+
+    Returns:
+        pd.DataFrame: Columns Year, Month, <dimension>, <measure>.
+    """
+    with span('aggregate'):
+        dates = df['Date'].dt
+        keys = [dates.year.rename('Year'), dates.month.rename('Month'), df[dimension]]
+        return measure_values(df, measure).groupby(keys, observed=True).sum().reset_index()
+
+def aggregate_by_month_chunked(file_path, dimension='Product', measure='Actuals', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Builds the aggregate_by_month table by streaming the file in chunks.
+
+    Each chunk is folded into running (Year, Month, dimension) sums and then
+    discarded, so memory is bounded by the size of the aggregate rather than
+    the size of the file.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        dimension (str): Column to break the measure down by.
+        measure (str): Numeric column to sum, or a key of DERIVED_MEASURES.
+        chunk_rows (int): Rows read per chunk.
+
+    Returns:
+        pd.DataFrame: Columns Year, Month, <dimension>, <measure>.
+    """
+    columns = ['Date', dimension] + measure_columns(measure)
+    return fold_monthly(iter_sales_chunks(file_path, columns, chunk_rows), dimension, measure)
+
+def fold_monthly(chunks, dimension='Product', measure='Actuals', monthly=None):
+    """
+    Folds row chunks into running (Year, Month, dimension) sums.
+
+    Args:
+        chunks (iterable): DataFrames with Date, dimension and measure columns.
+        dimension (str): Column to break the measure down by.
+        measure (str): Numeric column to sum.
+        monthly (pd.DataFrame): Existing sums to add to, if any.
+
+    Returns:
+        pd.DataFrame: Columns Year, Month, <dimension>, <measure>.
+    """
+    for chunk in chunks:
+        partial = aggregate_by_month(chunk, dimension, measure)
+        if monthly is not None:
+            with span('fold'):
+                partial = pd.concat([monthly, partial], ignore_index=True)
+                partial = partial.groupby(['Year', 'Month', dimension], observed=True)[measure].sum().reset_index()
+        monthly = partial
+
+    if monthly is None:
+        monthly = pd.DataFrame({'Year': pd.Series(dtype='int32'), 'Month': pd.Series(dtype='int32'),
+                                dimension: pd.Series(dtype=str), measure: pd.Series(dtype='float64')})
+    return monthly
+
+def roll_up(monthly, granularity, dimension='Product', measure='Actuals'):
+    """
+    Rolls a (Year, Month, dimension) table up to the given granularity.
+
+    Args:
+        monthly (pd.DataFrame): Output of aggregate_by_month.
+        granularity (str): 'Year', 'Quarter' or 'Month'.
+        dimension (str): Dimension column of the table.
+        measure (str): Measure column of the table.
+
+    Returns:
+        pd.DataFrame: Period columns from PERIOD_KEYS[granularity], <dimension>, <measure>.
+    """
+    if granularity == 'Month':
+        return monthly
+    if granularity == 'Quarter':
+        keys = [monthly['Year'], ((monthly['Month'] - 1) // 3 + 1).rename('Quarter'), monthly[dimension]]
+    elif granularity == 'Year':
+        keys = [monthly['Year'], monthly[dimension]]
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return monthly.groupby(keys, observed=True)[measure].sum().reset_index()
+
+def _select_largest(matrix, n):
+    """
+    Picks the n largest non-NaN entries of every row of a (period x member) matrix.
+
+    Each row is partitioned around its n-th largest value (O(members) per row,
+    all rows at once); only the entries at or above that cutoff are sorted.
+    Ties resolve to the lower column, i.e. the first member in sorted order.
+
+    Returns:
+        tuple: Row indices, column indices and 1-based ranks of the picks,
+        ordered by row and rank.
+    """
+    present = ~np.isnan(matrix)
+    filled = np.where(present, matrix, -np.inf)
+    k = min(n, matrix.shape[1])
+    if k < matrix.shape[1]:
+        cutoff = -np.partition(-filled, k - 1, axis=1)[:, k - 1]
+    else:
+        cutoff = np.full(matrix.shape[0], -np.inf)
+
+    rows, cols = np.nonzero(present & (filled >= cutoff[:, None]))
+    order = np.lexsort((cols, -filled[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows) + 1
+    keep = ranks <= n
+    return rows[keep], cols[keep], ranks[keep]
+
+def _select_largest_sparse(rows, cols, values, n):
+    """
+    Picks the n largest non-NaN values of every row from (row, column, value) triples.
+
+    Same picks and order as _select_largest, without building the matrix:
+    the triples are sorted by row, descending value and column, so memory
+    stays proportional to the number of triples.
+
+    Returns:
+        tuple: Positions of the picked triples and their 1-based ranks,
+        ordered by row and rank.
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    positions = positions[np.lexsort((cols[positions], -values[positions], rows[positions]))]
+    picked_rows = rows[positions]
+    ranks = np.arange(len(positions)) - np.searchsorted(picked_rows, picked_rows) + 1
+    keep = ranks <= n
+    return positions[keep], ranks[keep]
+
+def top_n_by_period(table, period_keys, dimension='Product', measure='Actuals', n=10):
+    """
+    Finds the top n and bottom n members of every period in one vectorized pass.
+
+    The table is scattered into a (period x member) matrix and both ends are
+    selected with a partial partition per row instead of a full sort per
+    period. When most (period, member) pairs are absent (e.g. daily periods
+    over many members), the rows are sorted within each period instead so
+    memory stays proportional to the table. Ties resolve to the first member
+    in sorted order.
+
+    Args:
+        table (pd.DataFrame): Aggregated table with one row per (period, member).
+        period_keys (list): Columns identifying a period.
+        dimension (str): Column holding the members to rank.
+        measure (str): Column to rank by.
+        n (int): Members to return from each end of every period.
+
+    Returns:
+        pd.DataFrame: Period columns, Direction ('Top' or 'Bottom'), Rank,
+        <dimension>, <measure> and Percentage of the period total, ordered by
+        period, direction and rank.
+    """
+    if n < 1:
+        raise ValueError(f"n must be at least 1, got {n}")
+    table = table.reset_index(drop=True)
+    grouped = table.groupby(period_keys, sort=True)
+    period_codes = grouped.ngroup().to_numpy()
+    totals = grouped[measure].sum().to_numpy()
+    periods = grouped.size().index.to_frame(index=False)
+    member_codes, members = pd.factorize(table[dimension], sort=True)
+    measures = table[measure].to_numpy(dtype='float64')
+
+    dense = len(periods) * len(members) <= DENSE_RANKING_FILL * max(len(table), 1)
+    if dense:
+        matrix = np.full((len(periods), len(members)), np.nan)
+        matrix[period_codes, member_codes] = measures
+
+    frames = []
+    for direction, sign in (('Top', 1), ('Bottom', -1)):
+        if dense:
+            rows, cols, ranks = _select_largest(sign * matrix, n)
+            values = matrix[rows, cols]
+        else:
+            positions, ranks = _select_largest_sparse(period_codes, member_codes, sign * measures, n)
+            rows, cols, values = period_codes[positions], member_codes[positions], measures[positions]
+        frame = periods.iloc[rows].reset_index(drop=True)
+        frame['Direction'] = direction
+        frame['Rank'] = ranks
+        frame[dimension] = members[cols]
+        frame[measure] = values
+        frame['Percentage'] = values / totals[rows] * 100
+        frame['_period'] = rows
+        frames.append(frame)
+
+    ranking = pd.concat(frames, ignore_index=True)
+    ranking = ranking.sort_values('_period', kind='stable').drop(columns='_period')
+    return ranking.reset_index(drop=True)
+
+def top_bottom_by_period(table, period_keys, dimension='Product', measure='Actuals'):
+    """
+    Finds the top and bottom member of every period in one vectorized pass.
+
+    Ties resolve to the first member in sorted order, as idxmax/idxmin do.
+
+    Args:
+        table (pd.DataFrame): Aggregated table with period columns, dimension and measure.
+        period_keys (list): Columns identifying a period.
+        dimension (str): Column holding the members to rank.
+        measure (str): Column to rank by.
+
+    Returns:
+        pd.DataFrame: One row per period with top/bottom member, amount and
+        percentage of the period total.
+    """
+    picks = top_n_by_period(table, period_keys, dimension, measure, n=1)
+    top = picks[picks['Direction'] == 'Top'].reset_index(drop=True)
+    bottom = picks[picks['Direction'] == 'Bottom'].reset_index(drop=True)
+
+    ranking = top[period_keys].copy()
+    ranking['Top'] = top[dimension]
+    ranking['Top_Amount'] = top[measure]
+    ranking['Top_Percentage'] = top['Percentage']
+    ranking['Bottom'] = bottom[dimension]
+    ranking['Bottom_Amount'] = bottom[measure]
+    ranking['Bottom_Percentage'] = bottom['Percentage']
+    return ranking
+
+def period_labels(ranking, granularity):
+    """
+    Builds sortable period labels ('2025', '2025-Q1', '2025-01') for a ranking table.
+
+    Args:
+        ranking (pd.DataFrame): Table with the period columns of the granularity.
+        granularity (str): 'Year', 'Quarter' or 'Month'.
+
+    Returns:
+        pd.Series: One label per row.
+    """
+    years = ranking['Year'].astype(str)
+    if granularity == 'Quarter':
+        return years + '-Q' + ranking['Quarter'].astype(str)
+    if granularity == 'Month':
+        return years + '-' + ranking['Month'].astype(str).str.zfill(2)
+    return years
+
+def build_product_performance(df):
+    """
+    Computes top and bottom products by year, quarter and month.
+
+    Args:
+        df (pd.DataFrame): Rows with Date (datetime), Product and Actuals columns.
+
+    Returns:
+        ProductPerformance: The monthly aggregate and the per-period rankings.
+    """
+    return product_performance_from_monthly(aggregate_by_month(df))
+
+def product_performance_from_monthly(monthly):
+    """
+    Ranks products for every period of an existing (Year, Month, Product) aggregate.
+
+    Args:
+        monthly (pd.DataFrame): Output of aggregate_by_month or aggregate_by_month_chunked.
+
+    Returns:
+        ProductPerformance: The monthly aggregate and the per-period rankings.
+    """
+    with span('rank'):
+        frames = [rank_granularity(monthly, granularity) for granularity in PERIOD_KEYS]
+        return ProductPerformance(monthly=monthly, rankings=_combine_rankings(frames))
+
+def rank_granularity(monthly, granularity):
+    """
+    Ranks products for every period of one granularity.
+
+    Args:
+        monthly (pd.DataFrame): (Year, Month, Product) aggregate, or any subset
+            holding complete periods of the granularity.
+        granularity (str): 'Year', 'Quarter' or 'Month'.
+
+    Returns:
+        pd.DataFrame: Ranking rows labelled with Granularity and Period.
+    """
+    ranking = top_bottom_by_period(roll_up(monthly, granularity), PERIOD_KEYS[granularity])
+    ranking.insert(0, 'Period', period_labels(ranking, granularity))
+    ranking.insert(0, 'Granularity', granularity)
+    return ranking
+
+def top_n_from_monthly(monthly, n=10, dimension='Product', measure='Actuals'):
+    """
+    Ranks the top n and bottom n members for every year, quarter and month.
+
+    Args:
+        monthly (pd.DataFrame): (Year, Month, dimension) aggregate of the measure.
+        n (int): Members to return from each end of every period.
+        dimension (str): Dimension column of the aggregate.
+        measure (str): Measure column of the aggregate.
+
+    Returns:
+        pd.DataFrame: Columns Granularity, Period, Year, Quarter, Month,
+        Direction, Rank, <dimension>, <measure> and Percentage, in report order.
+    """
+    with span('rank'):
+        frames = []
+        for granularity, period_keys in PERIOD_KEYS.items():
+            ranking = top_n_by_period(roll_up(monthly, granularity, dimension, measure), period_keys,
+                                      dimension, measure, n)
+            ranking.insert(0, 'Period', period_labels(ranking, granularity))
+            ranking.insert(0, 'Granularity', granularity)
+            frames.append(ranking)
+        return _combine_rankings(frames)
+
+def _combine_rankings(frames):
+    """Concatenates ranking frames in report order with nullable Quarter/Month columns."""
+    rankings = pd.concat(frames, ignore_index=True)
+    for column in ('Quarter', 'Month'):
+        rankings[column] = rankings[column].astype('Int64')
+    column_order = ['Granularity', 'Period', 'Year', 'Quarter', 'Month']
+    rankings = rankings[column_order + [c for c in rankings.columns if c not in column_order]]
+    granularity_order = rankings['Granularity'].map({g: i for i, g in enumerate(PERIOD_KEYS)})
+    order = np.lexsort((rankings['Period'].to_numpy(), granularity_order.to_numpy()))
+    return rankings.iloc[order].reset_index(drop=True)
+
+def load_sales_data_cached(file_path, cache, file_key=None):
+    """
+    Loads a sales file through an AnalysisCache, parsing it only on a cache miss.
+
+    Args:
+        file_path (str): The path to the CSV, Parquet or Feather file.
+        cache (AnalysisCache): Cache to read from and populate.
+        file_key (str): Precomputed cache.file_key(file_path), if available.
+
+    Returns:
+        pd.DataFrame: The parsed data.
+    """
+    key = cache.key(file_key or cache.file_key(file_path), artifact='sales_data')
+    df = cache.get(key)
+    if df is None:
+        df = load_sales_data(file_path)
+        cache.put(key, df)
+    return df
+
+def compute_product_performance(file_path, cache=None, chunk_rows=None):
+    """
+    Loads a sales file and computes its product performance rankings.
+
+    Args:
+        file_path (str): The path to the CSV, Parquet or Feather file.
+        cache (AnalysisCache): Optional cache; when given, the parsed frame and
+            the result are reused for as long as the file content is unchanged.
+        chunk_rows (int): Stream the file in chunks of this many rows instead
+            of loading it whole, for files larger than memory. The parsed
+            frame is never materialized (or cached) in this mode.
+
+    Returns:
+        ProductPerformance: The computed result.
+    """
+    def compute(file_key=None):
+        if chunk_rows:
+            return product_performance_from_monthly(aggregate_by_month_chunked(file_path, chunk_rows=chunk_rows))
+        if cache is None:
+            return build_product_performance(load_sales_data(file_path))
+        return build_product_performance(load_sales_data_cached(file_path, cache, file_key))
+
+    return _compute_cached(file_path, cache, compute, artifact='product_performance',
+                           dimension='Product', measure='Actuals')
+
+def compute_top_n(file_path, n=10, dimension='Product', measure='Actuals', cache=None, chunk_rows=None):
+    """
+    Loads a sales file and ranks the top n and bottom n members of a dimension
+    for every year, quarter and month.
+
+    Args:
+        file_path (str): The path to the CSV, Parquet or Feather file.
+        n (int): Members to return from each end of every period.
+        dimension (str): Column to rank, e.g. 'Product', 'Category' or 'City'.
+        measure (str): 'Actuals', 'Budget', or a key of DERIVED_MEASURES such as 'Variance'.
+        cache (AnalysisCache): Optional cache of parsed data and results.
+        chunk_rows (int): Stream the file in chunks of this many rows.
+
+    Returns:
+        pd.DataFrame: Output of top_n_from_monthly.
+    """
+    def compute(file_key=None):
+        if chunk_rows:
+            monthly = aggregate_by_month_chunked(file_path, dimension, measure, chunk_rows)
+        elif cache is None:
+            monthly = aggregate_by_month(load_sales_data(file_path), dimension, measure)
+        else:
+            monthly = aggregate_by_month(load_sales_data_cached(file_path, cache, file_key), dimension, measure)
+        return top_n_from_monthly(monthly, n, dimension, measure)
+
+    return _compute_cached(file_path, cache, compute, artifact='top_n', n=n, dimension=dimension, measure=measure)
+
+def _compute_cached(file_path, cache, compute, **params):
+    """Returns compute(file_key) through the cache entry for file_path and params, if caching."""
+    if cache is None:
+        return compute()
+
+    file_key = cache.file_key(file_path)
+    key = cache.key(file_key, **params)
+    result = cache.get(key)
+    if result is None:
+        result = compute(file_key)
+        cache.put(key, result)
+    return result
+
+# Bytes fingerprinted at the start of a ledger and just before the processed offset
+_LEDGER_FINGERPRINT_BYTES = 64 * 1024
+
+@dataclass
+class LedgerState:
+    """
+    Progress of an incremental analysis over an append-only CSV ledger.
+
+    Attributes:
+        offset (int): Byte offset just past the last processed line.
+        columns (list): Header of the ledger.
+        date_format (str): Date format detected on the first run.
+        head_digest (str): Digest of the ledger's first bytes.
+        tail_digest (str): Digest of the bytes just before offset.
+        performance (ProductPerformance): Result as of offset.
+    """
+    offset: int
+    columns: list
+    date_format: str
+    head_digest: str
+    tail_digest: str
+    performance: ProductPerformance
+
+class _ByteRangeReader(io.RawIOBase):
+    """Read-only view of a binary file from its current position up to an end offset."""
+
+    def __init__(self, f, end):
+        self.f = f
+        self.remaining = end - f.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+def _digest_range(f, start, end):
+    """Digests bytes [start, end) of a binary file."""
+    f.seek(max(start, 0))
+    return hashlib.blake2b(f.read(max(end - max(start, 0), 0)), digest_size=16).hexdigest()
+
+def _last_complete_line_end(f, size):
+    """Returns the offset just past the last newline, so a half-written final line is left for next time."""
+    position = size
+    while position > 0:
+        step = min(_LEDGER_FINGERPRINT_BYTES, position)
+        f.seek(position - step)
+        block = f.read(step)
+        newline = block.rfind(b'\n')
+        if newline != -1:
+            return position - step + newline + 1
+        position -= step
+    return 0
+
+def _load_ledger_state(state_path, f, size):
+    """Loads a saved LedgerState if it still describes a prefix of the ledger."""
+    try:
+        with open(state_path, 'rb') as state_file:
+            state = pickle.load(state_file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if not isinstance(state, LedgerState) or state.offset > size:
+        return None
+    if _digest_range(f, 0, min(state.offset, _LEDGER_FINGERPRINT_BYTES)) != state.head_digest:
+        return None
+    if _digest_range(f, state.offset - _LEDGER_FINGERPRINT_BYTES, state.offset) != state.tail_digest:
+        return None
+    return state
+
+def update_product_performance(file_path, state_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Incrementally analyzes an append-only CSV ledger.
+
+    The (Year, Month, Product) sums and rankings from the previous run are
+    loaded from state_path, and only the bytes appended since then are read.
+    Their sums are merged in, and only the months, quarters and years those
+    rows touch are re-ranked. If the ledger was rewritten rather than
+    appended to (its start or the bytes before the saved offset changed),
+    the state is rebuilt from scratch.
+
+    Args:
+        file_path (str): CSV ledger with Date, Product and Actuals columns.
+        state_path (str): File holding the LedgerState between runs.
+        chunk_rows (int): Rows read per chunk from the appended region.
+
+    Returns:
+        ProductPerformance: The up-to-date result.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = _last_complete_line_end(f, size)
+        state = _load_ledger_state(state_path, f, size)
+
+        f.seek(0)
+        if state is None:
+            columns = next(csv.reader(io.TextIOWrapper(_ByteRangeReader(f, end), encoding='utf-8', newline='')), [])
+            date_parser = DateParser()
+            monthly = None
+            rankings = None
+            f.seek(0)
+            read_options = {'header': 0}
+        else:
+            columns = state.columns
+            date_parser = DateParser(state.date_format)
+            monthly = state.performance.monthly
+            rankings = state.performance.rankings
+            f.seek(state.offset)
+            read_options = {'header': None, 'names': columns}
+
+        source = io.TextIOWrapper(io.BufferedReader(_ByteRangeReader(f, end)), encoding='utf-8', newline='')
+        reader = pd.read_csv(source, usecols=['Date', 'Product', 'Actuals'],
+                             dtype={'Product': str, 'Actuals': 'float64'}, chunksize=chunk_rows, **read_options)
+
+        def parsed_chunks(touched):
+            for chunk in reader:
+                chunk['Date'] = date_parser.parse(chunk['Date'])
+                touched.append(chunk['Date'].dt.year * 100 + chunk['Date'].dt.month)
+                yield chunk
+
+        touched = []
+        delta_monthly = fold_monthly(parsed_chunks(touched))
+
+        if rankings is None:
+            performance = product_performance_from_monthly(delta_monthly)
+        elif delta_monthly.empty:
+            performance = state.performance
+        else:
+            merged = pd.concat([monthly, delta_monthly], ignore_index=True)
+            monthly = merged.groupby(['Year', 'Month', 'Product'], observed=True)['Actuals'].sum().reset_index()
+
+            # Re-rank only the periods that received new rows
+            touched_months = pd.unique(pd.concat(touched).dropna().astype('int64'))
+            touched_years = touched_months // 100
+            touched_quarters = touched_years * 10 + (touched_months % 100 - 1) // 3 + 1
+            month_keys = monthly['Year'] * 100 + monthly['Month']
+            quarter_keys = monthly['Year'] * 10 + (monthly['Month'] - 1) // 3 + 1
+            subsets = {
+                'Year': monthly[monthly['Year'].isin(touched_years)],
+                'Quarter': monthly[quarter_keys.isin(touched_quarters)],
+                'Month': monthly[month_keys.isin(touched_months)],
+            }
+            refreshed = [rank_granularity(subset, granularity) for granularity, subset in subsets.items()]
+            refreshed_keys = set()
+            for frame in refreshed:
+                refreshed_keys.update(zip(frame['Granularity'], frame['Period']))
+            kept = rankings[[key not in refreshed_keys for key in zip(rankings['Granularity'], rankings['Period'])]]
+            performance = ProductPerformance(monthly=monthly, rankings=_combine_rankings([kept] + refreshed))
+
+        new_state = LedgerState(
+            offset=end,
+            columns=columns,
+            date_format=date_parser.date_format,
+            head_digest=_digest_range(f, 0, min(end, _LEDGER_FINGERPRINT_BYTES)),
+            tail_digest=_digest_range(f, end - _LEDGER_FINGERPRINT_BYTES, end),
+            performance=performance,
+        )
+
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'wb') as state_file:
+        pickle.dump(new_state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+    return performance
+
+def format_product_performance(result):
+    """
+    Formats a ProductPerformance as the human-readable report printed by the CLI.
+
+    Args:
+        result (ProductPerformance): Result to format.
+
+    Returns:
+        str: The report text.
+    """
+    lines = []
+    for granularity, heading in PERIOD_HEADINGS.items():
+        lines.append(heading if not lines else f"\n{heading}")
+        for period in result.periods(granularity).itertuples(index=False):
+            if granularity == 'Year':
+                label = f"Year: {period.Year}"
+            elif granularity == 'Quarter':
+                label = f"Quarter: Q{period.Quarter} {period.Year}"
+            else:
+                label = f"Month: {period.Month}/{period.Year}"
+            lines.append(f"\n{label}")
+            lines.append(f"  Top Product: {period.Top} - Amount: ${period.Top_Amount:,.2f}, Percentage: {period.Top_Percentage:.2f}%")
+            lines.append(f"  Bottom Product: {period.Bottom} - Amount: ${period.Bottom_Amount:,.2f}, Percentage: {period.Bottom_Percentage:.2f}%")
+    return "\n".join(lines)
+
+def format_top_n(rankings, dimension='Product', measure='Actuals'):
+    """
+    Formats the output of top_n_from_monthly as a human-readable report.
+
+    Args:
+        rankings (pd.DataFrame): Ranking rows to format.
+        dimension (str): Dimension column of the rankings.
+        measure (str): Measure column of the rankings.
+
+    Returns:
+        str: The report text.
+    """
+    lines = []
+    for granularity, heading in PERIOD_HEADINGS.items():
+        lines.append(heading if not lines else f"\n{heading}")
+        periods = rankings[rankings['Granularity'] == granularity]
+        for period, picks in periods.groupby('Period', sort=False):
+            lines.append(f"\n{granularity}: {period}")
+            for direction in ('Top', 'Bottom'):
+                lines.append(f"  {direction} {dimension}:")
+                for pick in picks[picks['Direction'] == direction].itertuples(index=False):
+                    lines.append(f"    {pick.Rank}. {getattr(pick, dimension)} - {measure}: "
+                                 f"${getattr(pick, measure):,.2f}, Percentage: {pick.Percentage:.2f}%")
+    return "\n".join(lines)
+
+def analyze_product_performance(file_path, cache=None, chunk_rows=None, state_path=None):
+    """
+    Analyzes product performance from a sales file, printing the top and bottom
+    products by year, quarter, and month.
+
+    Args:
+        file_path (str): The path to the CSV, Parquet or Feather file.
+        cache (AnalysisCache): Optional cache of parsed data and results.
+        chunk_rows (int): Stream the file in chunks of this many rows.
+        state_path (str): Incrementally update from the rows appended to a CSV
+            ledger since the run recorded in this state file.
+
+    Returns:
+        ProductPerformance: The computed result, for callers that want the data.
+    """
+    if state_path:
+        result = update_product_performance(file_path, state_path, chunk_rows=chunk_rows or DEFAULT_CHUNK_ROWS)
+    else:
+        result = compute_product_performance(file_path, cache=cache, chunk_rows=chunk_rows)
+    with span('format_report'):
+        report = format_product_performance(result)
+    print(report)
+    return result
+
+@dataclass
+class BatchResult:
+    """
+    Combined outcome of analyzing many files.
+
+    Attributes:
+        rankings (pd.DataFrame): Rankings of every successful file, with a
+            leading File column.
+        failures (dict): File path -> error message for files that failed.
+    """
+    rankings: pd.DataFrame
+    failures: dict = field(default_factory=dict)
+
+    def to_json(self, path=None):
+        """Serializes the rankings and failures to JSON, writing them to path when given."""
+        text = json.dumps({'results': json.loads(self.rankings.to_json(orient='records')),
+                           'failures': self.failures}, indent=2)
+        if path is not None:
+            Path(path).write_text(text, encoding='utf-8')
+        return text
+
+    def to_parquet(self, path):
+        """Writes the combined rankings to a Parquet file (requires pyarrow); failures are not included."""
+        self.rankings.to_parquet(path, index=False)
+
+def expand_inputs(path_or_pattern):
+    """
+    Resolves a file, a directory or a glob pattern to the sales files it names.
+
+    Args:
+        path_or_pattern (str): File path, directory (its .csv, .parquet and
+            .feather files are used) or glob pattern such as 'uploads/*.csv'.
+
+    Returns:
+        list: Sorted file paths.
+    """
+    if os.path.isdir(path_or_pattern):
+        return sorted(str(path) for path in Path(path_or_pattern).iterdir()
+                      if path.is_file() and path.suffix.lower() in SALES_FILE_SUFFIXES)
+    if glob.has_magic(path_or_pattern):
+        return sorted(path for path in glob.glob(path_or_pattern, recursive=True) if os.path.isfile(path))
+    return [path_or_pattern]
+
+def _analyze_batch_file(file_path, chunk_rows, cache_dir, cache_max_bytes, cache_key_mode):
+    """Worker: computes one file's rankings, returning the error text instead of raising."""
+    try:
+        cache = None
+        if cache_dir:
+            cache = AnalysisCache(cache_dir, max_bytes=cache_max_bytes, key_mode=cache_key_mode)
+        return compute_product_performance(file_path, cache=cache, chunk_rows=chunk_rows).rankings, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def analyze_batch(file_paths, workers=None, chunk_rows=None, cache_dir=None, cache_max_bytes=None,
+                  cache_key_mode='hash'):
+    """
+    Computes product performance for many files in a process pool.
+
+    A file that fails to load or analyze is recorded in the result's
+    failures and does not stop the others.
+
+    Args:
+        file_paths (list): Sales files to analyze.
+        workers (int): Maximum worker processes (default: the CPU count, capped at the number of files).
+        chunk_rows (int): Stream each file in chunks of this many rows.
+        cache_dir (str): Share an AnalysisCache in this directory between workers.
+        cache_max_bytes (int): Size limit of the shared cache.
+        cache_key_mode (str): 'hash' or 'stat' (see AnalysisCache).
+
+    Returns:
+        BatchResult: Combined rankings in input file order, and failures.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(file_paths) or 1))
+    cache_max_bytes = cache_max_bytes or 512 * 1024 * 1024
+    outcomes = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_analyze_batch_file, file_path, chunk_rows, cache_dir, cache_max_bytes,
+                               cache_key_mode): file_path for file_path in file_paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
+            try:
+                outcomes[file_path] = future.result()
+            except Exception as e:  # the worker process itself died
+                outcomes[file_path] = (None, f"{type(e).__name__}: {e}")
+            rankings, error = outcomes[file_path]
+            status = f"❌ {error}" if error else f"✅ {len(rankings)} periods"
+            print(f"[{done}/{len(file_paths)}] {file_path}: {status}")
+
+    frames, failures = [], {}
+    for file_path in file_paths:
+        rankings, error = outcomes[file_path]
+        if error:
+            failures[file_path] = error
+        else:
+            frames.append(rankings.assign(File=file_path))
+    if frames:
+        combined = pd.concat(frames, ignore_index=True)
+        combined = combined[['File'] + [column for column in combined.columns if column != 'File']]
+    else:
+        combined = pd.DataFrame(columns=['File'])
+    return BatchResult(rankings=combined, failures=failures)
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Top and bottom products by year, quarter and month.')
+    parser.add_argument('file_path', nargs='?',
+                        default="F:/GEMINI/Projects/beautiful/Sample Data/REG.csv",
+                        help='Sales file to analyze (.csv, .parquet or .feather), or a directory or '
+                             'glob pattern to analyze many files in batch mode')
+    parser.add_argument('--workers', '-w', type=int,
+                        help='Batch mode: maximum worker processes (default: CPU count)')
+    parser.add_argument('--output', '-o',
+                        help='Also write the rankings to a .json or .parquet file')
+    parser.add_argument('--chunk-rows', type=int,
+                        help='Stream the file in chunks of N rows, for files larger than memory')
+    parser.add_argument('--state',
+                        help='Incremental mode for growing CSV ledgers: only read rows appended since the run saved in this state file')
+    parser.add_argument('--top', type=int, metavar='N',
+                        help='Report the top N and bottom N members of --dimension per period instead')
+    parser.add_argument('--dimension', default='Product',
+                        help='Column ranked by --top, e.g. Category, Region, Country, City, Channel (default: Product)')
+    parser.add_argument('--measure', default='Actuals',
+                        help="Measure ranked by --top: Actuals, Budget or Variance (Actuals - Budget) (default: Actuals)")
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse parsed data and results for unchanged files')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Cache directory (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-max-mb', type=int, default=512,
+                        help='Evict least recently used cache entries beyond this size (default: 512)')
+    parser.add_argument('--cache-key', choices=['hash', 'stat'], default='hash',
+                        help="Key cache entries on file content ('hash') or size and mtime ('stat')")
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+    batch = os.path.isdir(args.file_path) or glob.has_magic(args.file_path)
+    if batch and (args.state or args.top is not None):
+        parser.error('batch mode cannot be combined with --state or --top')
+    if args.top is not None and args.state:
+        parser.error('--top cannot be combined with --state')
+    if args.top is not None and args.top < 1:
+        parser.error('--top must be at least 1')
+
+    if args.profile:
+        profiling.enable()
+
+    if batch:
+        file_paths = expand_inputs(args.file_path)
+        if not file_paths:
+            parser.error(f'no sales files match {args.file_path}')
+        with span('analyze_batch'):
+            result = analyze_batch(file_paths, workers=args.workers, chunk_rows=args.chunk_rows,
+                                   cache_dir=args.cache_dir if args.cache else None,
+                                   cache_max_bytes=args.cache_max_mb * 1024 * 1024, cache_key_mode=args.cache_key)
+        print(f"\n📊 {len(file_paths) - len(result.failures)} of {len(file_paths)} files analyzed")
+        if args.output:
+            if Path(args.output).suffix.lower() == '.parquet':
+                result.to_parquet(args.output)
+            else:
+                result.to_json(args.output)
+        if args.profile:
+            profiling.get_profiler().dump(args.profile)
+        if result.failures:
+            raise SystemExit(1)
+        return
+
+    cache = None
+    if args.cache:
+        cache = AnalysisCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024, key_mode=args.cache_key)
+
+    if args.top is not None:
+        with span('analyze'):
+            rankings = compute_top_n(args.file_path, args.top, args.dimension, args.measure,
+                                     cache=cache, chunk_rows=args.chunk_rows)
+            with span('format_report'):
+                report = format_top_n(rankings, args.dimension, args.measure)
+        print(report)
+        if args.output:
+            if Path(args.output).suffix.lower() == '.parquet':
+                rankings.to_parquet(args.output, index=False)
+            else:
+                Path(args.output).write_text(rankings.to_json(orient='records', indent=2), encoding='utf-8')
+    else:
+        with span('analyze'):
+            result = analyze_product_performance(args.file_path, cache=cache, chunk_rows=args.chunk_rows,
+                                                 state_path=args.state)
+        if args.output:
+            if Path(args.output).suffix.lower() == '.parquet':
+                result.to_parquet(args.output)
+            else:
+                result.to_json(args.output)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
 
 
 if __name__ == "__main__":
-    analyze_product_performance("F:/GEMINI/Projects/beautiful/Sample Data/REG.csv")
+    main()
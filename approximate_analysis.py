@@ -0,0 +1,453 @@
+"""
+Approximate single-pass analysis with fixed-size sketches.
+
+For a first look at ledgers too large for exact group-bys, one streaming pass
+keeps, per period, a weighted Space-Saving summary of the heaviest members of
+a dimension and a Count-Min sketch of every member's total. It also keeps one
+HyperLogLog per text column for distinct counts. Each sketch has a fixed size,
+so memory depends on the number of periods and the sketch parameters, not on
+the number of rows. Every estimate comes with its error bound: Space-Saving
+bounds are deterministic, Count-Min bounds hold with probability 1 - delta,
+and HyperLogLog has a known relative standard error.
+"""
+
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analyze_reg import DEFAULT_CHUNK_ROWS, iter_sales_chunks, measure_columns, measure_values
+from profiling import span
+from rollup_cube import GRAINS, HIERARCHIES, file_columns, period_keys
+
+# Counters kept per period by the Space-Saving summary
+DEFAULT_CAPACITY = 100
+
+# Count-Min sketch shape: error e / width of the period total, with probability 1 - exp(-depth)
+DEFAULT_CMS_WIDTH = 2048
+DEFAULT_CMS_DEPTH = 5
+
+# HyperLogLog registers are 2 ** precision; relative standard error 1.04 / sqrt(2 ** precision)
+DEFAULT_HLL_PRECISION = 14
+
+# Text columns counted with HyperLogLog when present
+DISTINCT_COLUMNS = [column for levels in HIERARCHIES.values() for column in levels]
+
+
+def hash_values(values):
+    """
+    Hashes values to 64 bits, consistently across chunks, dtypes and processes.
+
+    Args:
+        values (array-like): Strings, categoricals or numbers.
+
+    Returns:
+        np.ndarray: uint64 hashes.
+    """
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2 ** precision one-byte registers.
+
+    Args:
+        precision (int): Bits of the hash that pick the register, 4 to 18.
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """Relative standard error of the estimate."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, values):
+        """Adds values (duplicates are harmless, so unique values suffice)."""
+        hashes = hash_values(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # Rank of the first set bit in the remaining 64 - p bits. Up to 60 bits do not
+        # fit a float64 exactly, so the bit length is found by halving in integers.
+        remaining = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        bit_length = np.zeros(len(remaining), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            high = remaining >> np.uint64(shift) != 0
+            bit_length[high] += shift
+            remaining[high] >>= np.uint64(shift)
+        bit_length += remaining != 0
+        rank = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """Folds in a sketch of the same precision."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        """
+        Estimates the number of distinct values added.
+
+        Returns:
+            float: The estimate, using linear counting while registers are still empty.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return float(raw)
+
+
+class CountMinSketch:
+    """
+    Frequency sketch answering "total weight of item x" with one-sided error.
+
+    Estimates never fall below the true total (for non-negative weights) and
+    exceed it by at most e / width of the total weight added, with
+    probability 1 - exp(-depth).
+
+    Args:
+        width (int): Counters per row, rounded up to a power of two.
+        depth (int): Independent hash rows.
+        seed (int): Seed of the multiply-shift hash functions.
+    """
+
+    def __init__(self, width=DEFAULT_CMS_WIDTH, depth=DEFAULT_CMS_DEPTH, seed=0):
+        self.bits = max(1, int(math.ceil(math.log2(width))))
+        self.table = np.zeros((depth, 1 << self.bits))
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.total = 0.0
+
+    @property
+    def epsilon(self):
+        """Error bound as a fraction of the total weight."""
+        return math.e / self.table.shape[1]
+
+    @property
+    def delta(self):
+        """Probability that an estimate exceeds the error bound."""
+        return math.exp(-self.table.shape[0])
+
+    def _columns(self, hashes):
+        return (self.multipliers[:, None] * hashes[None, :]) >> np.uint64(64 - self.bits)
+
+    def add(self, hashes, weights):
+        """
+        Adds weights to the counters of hashed items.
+
+        Args:
+            hashes (np.ndarray): uint64 item hashes.
+            weights (np.ndarray): Non-negative weights.
+        """
+        weights = np.asarray(weights, dtype='float64')
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns.astype(np.intp), weights=weights, minlength=self.table.shape[1])
+        self.total += float(weights.sum())
+
+    def query(self, hashes):
+        """Upper estimates of the totals of hashed items."""
+        columns = self._columns(hashes).astype(np.intp)
+        return self.table[np.arange(len(self.table))[:, None], columns].min(axis=0)
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving summary of the heaviest items.
+
+    Keeps at most capacity counters. Each counter overestimates its item's
+    total by at most its recorded error, and no unmonitored item has a
+    total above the smallest counter.
+
+    Args:
+        capacity (int): Counters kept.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='float64')
+        self.errors = pd.Series(dtype='float64')
+
+    @property
+    def floor(self):
+        """Upper bound on the total of any unmonitored item."""
+        return float(self.counts.min()) if len(self.counts) >= self.capacity else 0.0
+
+    def update(self, weights):
+        """
+        Folds in exact per-item totals of a batch.
+
+        Items already monitored add their weight. New items start from the
+        current floor, which becomes their error, as in Space-Saving's
+        replacement of the smallest counter.
+
+        Args:
+            weights (pd.Series): Non-negative totals indexed by item.
+        """
+        floor = self.floor
+        new = ~weights.index.isin(self.counts.index)
+        counts = self.counts.add(weights, fill_value=0)
+        errors = self.errors.reindex(counts.index, fill_value=0.0)
+        new_items = weights.index[new]
+        counts.loc[new_items] += floor
+        errors.loc[new_items] = floor
+
+        keep = counts.sort_values(ascending=False, kind='stable').index[:self.capacity]
+        self.counts, self.errors = counts[keep], errors[keep]
+
+
+class ApproximateSummary:
+    """
+    Fixed-size sketches of a sales file, built in one streaming pass.
+
+    Args:
+        dimension (str): Column whose heaviest members are tracked per period.
+        measure (str): Non-negative measure to sum; negative values are skipped and counted.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        distinct_columns (list): Text columns to count distinct values of.
+        capacity (int): Space-Saving counters per period.
+        cms_width (int): Count-Min counters per row.
+        cms_depth (int): Count-Min rows.
+        hll_precision (int): HyperLogLog precision.
+    """
+
+    def __init__(self, dimension='Product', measure='Actuals', grain='Month', distinct_columns=(),
+                 capacity=DEFAULT_CAPACITY, cms_width=DEFAULT_CMS_WIDTH, cms_depth=DEFAULT_CMS_DEPTH,
+                 hll_precision=DEFAULT_HLL_PRECISION):
+        self.dimension = dimension
+        self.measure = measure
+        self.grain = grain
+        self.capacity = capacity
+        self.cms_width = cms_width
+        self.cms_depth = cms_depth
+        self.heavy_hitters = {}
+        self.frequencies = {}
+        self.period_totals = {}
+        self.distinct = {column: HyperLogLog(hll_precision) for column in distinct_columns}
+        self.rows = 0
+        self.negative_rows = 0
+
+    def update(self, chunk):
+        """
+        Folds one chunk of rows into the sketches.
+
+        Args:
+            chunk (pd.DataFrame): Rows with a datetime 'Date' column.
+        """
+        with span('sketch'):
+            chunk = chunk[chunk['Date'].notna()]
+            self.rows += len(chunk)
+            for column, sketch in self.distinct.items():
+                sketch.update(chunk[column].dropna().unique())
+
+            values = measure_values(chunk, self.measure)
+            negative = values.to_numpy() < 0
+            if negative.any():
+                self.negative_rows += int(negative.sum())
+                values, chunk = values[~negative], chunk[~negative]
+
+            # Exact totals within the chunk, then one sketch update per period
+            keys = period_keys(chunk['Date'], self.grain) + [chunk[self.dimension]]
+            totals = values.groupby(keys, observed=True).sum()
+            if self.grain == 'All':
+                groups = [((), totals)]
+            else:
+                groups = totals.groupby(level=list(range(len(keys) - 1)), sort=False)
+            for period, weights in groups:
+                period = period if isinstance(period, tuple) else (period,)
+                weights = weights.droplevel(list(range(len(keys) - 1))) if len(keys) > 1 else weights
+                weights = weights[weights > 0]
+                if period not in self.heavy_hitters:
+                    self.heavy_hitters[period] = SpaceSaving(self.capacity)
+                    self.frequencies[period] = CountMinSketch(self.cms_width, self.cms_depth)
+                    self.period_totals[period] = 0.0
+                self.heavy_hitters[period].update(weights)
+                self.frequencies[period].add(hash_values(weights.index), weights.to_numpy())
+                self.period_totals[period] += float(weights.sum())
+
+    @property
+    def memory_bytes(self):
+        """Approximate size of all sketches."""
+        hll = sum(sketch.registers.nbytes for sketch in self.distinct.values())
+        cms = sum(sketch.table.nbytes for sketch in self.frequencies.values())
+        space_saving = sum(summary.counts.memory_usage(deep=True) + summary.errors.memory_usage(deep=True)
+                           for summary in self.heavy_hitters.values())
+        return int(hll + cms + space_saving)
+
+    def top(self, n=10):
+        """
+        Estimates the top n members of every period, with bounds.
+
+        Upper bounds are the smaller of the Space-Saving counter and the
+        Count-Min estimate (both overestimates); lower bounds are the counter
+        minus its error. A member is Guaranteed to be in the true top n when
+        its lower bound is at least every other candidate's upper bound and
+        the bound on unmonitored members.
+
+        Args:
+            n (int): Members per period.
+
+        Returns:
+            pd.DataFrame: Period columns, Rank, <dimension>, Estimate (the
+            upper bound), Lower_Bound, Percentage of the period total and
+            Guaranteed.
+        """
+        period_columns = GRAINS[self.grain]
+        frames = []
+        for period in sorted(self.heavy_hitters):
+            summary = self.heavy_hitters[period]
+            if summary.counts.empty:
+                continue
+            upper = np.minimum(summary.counts.to_numpy(),
+                               self.frequencies[period].query(hash_values(summary.counts.index)))
+            lower = (summary.counts - summary.errors).to_numpy()
+            order = np.lexsort((np.arange(len(upper)), -upper))
+            upper, lower, members = upper[order], lower[order], summary.counts.index[order]
+
+            # Best rival of each of the top n: the largest upper bound outside the top n
+            rival = max(float(upper[n]) if len(upper) > n else 0.0, summary.floor)
+            picked = min(n, len(upper))
+            frame = pd.DataFrame({
+                'Rank': np.arange(1, picked + 1),
+                self.dimension: members[:picked],
+                'Estimate': upper[:picked],
+                'Lower_Bound': lower[:picked],
+                'Percentage': upper[:picked] / self.period_totals[period] * 100 if self.period_totals[period] else 0.0,
+                'Guaranteed': lower[:picked] >= rival,
+            })
+            for column, value in reversed(list(zip(period_columns, period))):
+                frame.insert(0, column, value)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=period_columns + ['Rank', self.dimension, 'Estimate', 'Lower_Bound',
+                                                          'Percentage', 'Guaranteed'])
+        return pd.concat(frames, ignore_index=True)
+
+    def distinct_counts(self):
+        """
+        Estimated distinct values per text column.
+
+        Returns:
+            pd.DataFrame: Column, Estimate and Error_95 (absolute, two standard errors).
+        """
+        rows = [(column, sketch.estimate(), 2 * sketch.relative_error * sketch.estimate())
+                for column, sketch in self.distinct.items()]
+        return pd.DataFrame(rows, columns=['Column', 'Estimate', 'Error_95'])
+
+
+def approximate_analysis(file_path, dimension='Product', measure='Actuals', grain='Month', distinct_columns=None,
+                         capacity=DEFAULT_CAPACITY, cms_width=DEFAULT_CMS_WIDTH, cms_depth=DEFAULT_CMS_DEPTH,
+                         hll_precision=DEFAULT_HLL_PRECISION, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Sketches a sales file in one streaming pass.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        dimension (str): Column whose heaviest members are tracked.
+        measure (str): Non-negative measure to sum.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        distinct_columns (list): Columns to count distinct values of; every
+            column of DISTINCT_COLUMNS in the file if None.
+        capacity (int): Space-Saving counters per period.
+        cms_width (int): Count-Min counters per row.
+        cms_depth (int): Count-Min rows.
+        hll_precision (int): HyperLogLog precision.
+        chunk_rows (int): Rows read per chunk.
+
+    Returns:
+        ApproximateSummary: The filled sketches.
+    """
+    columns = file_columns(file_path)
+    if distinct_columns is None:
+        distinct_columns = [column for column in DISTINCT_COLUMNS if column in columns]
+    missing = [column for column in [dimension] + list(distinct_columns) if column not in columns]
+    if missing:
+        raise ValueError(f"Columns not found in {file_path}: {', '.join(missing)}")
+
+    summary = ApproximateSummary(dimension, measure, grain, distinct_columns, capacity, cms_width, cms_depth,
+                                 hll_precision)
+    read_columns = list(dict.fromkeys(['Date', dimension] + list(distinct_columns) + measure_columns(measure)))
+    for chunk in iter_sales_chunks(file_path, read_columns, chunk_rows):
+        summary.update(chunk)
+    return summary
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Approximate first look at a large sales file: sketched top members '
+                                                 'per period and distinct counts, with error bounds, in one pass.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--dimension', default='Product',
+                        help='Column whose top members are estimated (default: Product)')
+    parser.add_argument('--measure', default='Actuals',
+                        help='Non-negative measure to sum (default: Actuals)')
+    parser.add_argument('--grain', choices=list(GRAINS), default='Month',
+                        help='Period grain (default: Month)')
+    parser.add_argument('--top', type=int, default=5, metavar='N',
+                        help='Members to list per period (default: 5)')
+    parser.add_argument('--distinct', metavar='COLUMNS',
+                        help='Comma-separated columns to count distinct values of (default: all hierarchy columns present)')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help=f'Space-Saving counters per period (default: {DEFAULT_CAPACITY})')
+    parser.add_argument('--cms-width', type=int, default=DEFAULT_CMS_WIDTH,
+                        help=f'Count-Min sketch width (default: {DEFAULT_CMS_WIDTH})')
+    parser.add_argument('--cms-depth', type=int, default=DEFAULT_CMS_DEPTH,
+                        help=f'Count-Min sketch depth (default: {DEFAULT_CMS_DEPTH})')
+    parser.add_argument('--hll-precision', type=int, default=DEFAULT_HLL_PRECISION,
+                        help=f'HyperLogLog precision, 4-18 (default: {DEFAULT_HLL_PRECISION})')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Rows read per chunk (default: {DEFAULT_CHUNK_ROWS})')
+    parser.add_argument('--output', '-o',
+                        help='Also write the top-member table to a .csv or .parquet file')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    distinct_columns = [column for column in args.distinct.split(',') if column] if args.distinct else None
+    with span('approximate'):
+        summary = approximate_analysis(args.file_path, args.dimension, args.measure, args.grain, distinct_columns,
+                                       args.capacity, args.cms_width, args.cms_depth, args.hll_precision,
+                                       args.chunk_rows)
+        top = summary.top(args.top)
+
+    cms = CountMinSketch(args.cms_width, args.cms_depth)
+    print(f"≈ Approximate analysis of {args.file_path}: {summary.rows:,} rows, "
+          f"sketches {summary.memory_bytes / 1024:,.0f} KB")
+    print(f"  Top {args.dimension} bounds: Space-Saving lower/upper bounds are exact; Count-Min upper bounds are "
+          f"within {cms.epsilon * 100:.2f}% of the period total with probability {1 - cms.delta:.3f}")
+    if summary.negative_rows:
+        print(f"  ⚠️ {summary.negative_rows:,} rows with negative {args.measure} were skipped")
+
+    distinct = summary.distinct_counts()
+    if not distinct.empty:
+        print("\nDistinct values (HyperLogLog, ±2 standard errors):")
+        for row in distinct.itertuples(index=False):
+            print(f"  {row.Column}: ~{row.Estimate:,.0f} ± {row.Error_95:,.0f}")
+
+    with pd.option_context('display.float_format', '{:,.2f}'.format):
+        print(f"\nTop {args.top} {args.dimension} by {args.measure} (Estimate is an upper bound):")
+        print(top.to_string(index=False))
+
+    if args.output:
+        if Path(args.output).suffix.lower() == '.parquet':
+            top.to_parquet(args.output, index=False)
+        else:
+            top.to_csv(args.output, index=False)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
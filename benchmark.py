@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the sample data generator and the REG analyzer.
+
+Times and memory-profiles SampleDataGenerator.generate_data and
+analyze_product_performance over the files in Sample Data/ and over
+synthetic datasets made by the generator, and writes the results as JSON
+so runs can be compared between versions.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from profiling import peak_rss_mb
+
+REPO_DIR = Path(__file__).resolve().parent
+SAMPLE_DATA_DIR = REPO_DIR / 'Sample Data'
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+# Chunk size used by the streaming cases
+STREAM_CHUNK_ROWS = 250_000
+
+# Generator parameters shared by every synthetic dataset
+BENCH_BUSINESS = 'tech startup'
+BENCH_START_DATE = '2023-01-01'
+BENCH_END_DATE = '2024-12-31'
+
+
+def _generate(rows: int, output_file: str, output_format: str = 'csv', chunk_size: Optional[int] = None) -> None:
+    """Generate a synthetic dataset with the benchmark parameters"""
+    from generate_sample_data import SampleDataGenerator
+
+    generator = SampleDataGenerator()
+    products, _, mapping = generator.ai_generator.generate_products_and_categories(BENCH_BUSINESS, use_ai=False)
+    generator.generate_data(BENCH_START_DATE, BENCH_END_DATE, rows, products, mapping, output_file,
+                            business_type=BENCH_BUSINESS, chunk_size=chunk_size, output_format=output_format)
+
+
+def _run_case(case: Dict, repeat: int, scratch_dir: str) -> Dict:
+    """
+    Run one benchmark case in the current (fresh) process
+
+    Returns:
+        The case description plus timings, peak RSS and the RSS after imports
+    """
+    sys.path.insert(0, str(REPO_DIR))
+    import analyze_reg
+    import generate_sample_data  # noqa: F401 - imported up front so it counts towards baseline RSS
+
+    baseline_rss = peak_rss_mb()
+    timings = []
+    for _ in range(repeat):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            if case['component'] == 'generator':
+                output_file = os.path.join(scratch_dir, f"gen_{os.getpid()}.{case['format']}")
+                _generate(case['rows'], output_file, case['format'], case.get('chunk_rows'))
+                elapsed = time.perf_counter() - start
+                os.remove(output_file)
+            else:
+                analyze_reg.compute_product_performance(case['input'], chunk_rows=case.get('chunk_rows'))
+                elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+
+    median = statistics.median(timings)
+    return {
+        **case,
+        'seconds': timings,
+        'median_seconds': median,
+        'min_seconds': min(timings),
+        'rows_per_second': case['rows'] / median if median > 0 else None,
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _count_rows(file_path: Path) -> int:
+    """Number of data rows in a CSV file"""
+    with open(file_path, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def build_cases(scales: List[int], data_dir: str, include_samples: bool = True,
+                pattern: Optional[str] = None) -> List[Dict]:
+    """
+    Describe every benchmark case, generating synthetic analyzer inputs as needed
+
+    Args:
+        pattern: Only keep cases whose name contains this substring; inputs
+            are only generated for the analyzer cases that are kept
+
+    Returns:
+        List of case dicts with name, component, rows and mode
+    """
+    def selected(name: str) -> bool:
+        return not pattern or pattern in name
+
+    cases = []
+    for rows in scales:
+        for mode, output_format, chunk_rows in (('memory', 'csv', None),
+                                                ('stream', 'csv', STREAM_CHUNK_ROWS),
+                                                ('stream', 'parquet', STREAM_CHUNK_ROWS)):
+            name = f'generate/{mode}/{output_format}/{rows}'
+            if not selected(name):
+                continue
+            cases.append({'name': name, 'component': 'generator',
+                          'rows': rows, 'mode': mode, 'format': output_format, 'chunk_rows': chunk_rows})
+
+    if include_samples:
+        for sample in sorted(SAMPLE_DATA_DIR.glob('*.csv')):
+            with open(sample, 'r', encoding='utf-8') as f:
+                header = f.readline().strip().split(',')
+            name = f'analyze/memory/sample/{sample.stem}'
+            if not {'Date', 'Product', 'Actuals'} <= set(header) or not selected(name):
+                continue
+            cases.append({'name': name, 'component': 'analyzer',
+                          'rows': _count_rows(sample), 'mode': 'memory', 'format': 'csv', 'input': str(sample)})
+
+    for rows in scales:
+        for output_format in ('csv', 'parquet'):
+            modes = [(mode, chunk_rows) for mode, chunk_rows in (('memory', None), ('stream', STREAM_CHUNK_ROWS))
+                     if selected(f'analyze/{mode}/{output_format}/{rows}')]
+            if not modes:
+                continue
+            input_file = os.path.join(data_dir, f'synthetic_{rows}.{output_format}')
+            if not os.path.exists(input_file):
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    _generate(rows, input_file, output_format, chunk_size=STREAM_CHUNK_ROWS)
+            for mode, chunk_rows in modes:
+                cases.append({'name': f'analyze/{mode}/{output_format}/{rows}', 'component': 'analyzer',
+                              'rows': rows, 'mode': mode, 'format': output_format,
+                              'chunk_rows': chunk_rows, 'input': input_file})
+    return cases
+
+
+def _environment() -> Dict:
+    """Versions and machine details recorded with each run"""
+    import numpy as np
+    import pandas as pd
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmarks(scales: List[int], repeat: int = DEFAULT_REPEAT, data_dir: Optional[str] = None,
+                   pattern: Optional[str] = None, include_samples: bool = True) -> Dict:
+    """
+    Run the benchmark suite, each case in its own process so peak RSS is per case
+
+    Args:
+        scales: Synthetic dataset sizes in rows
+        repeat: Timed repetitions per case
+        data_dir: Where synthetic inputs are kept (a temporary directory if None)
+        pattern: Only run cases whose name contains this substring
+        include_samples: Also analyze the files in Sample Data/
+
+    Returns:
+        Report dict with 'environment' and 'results'
+    """
+    owns_data_dir = data_dir is None
+    data_dir = data_dir or tempfile.mkdtemp(prefix='qc_bench_')
+    os.makedirs(data_dir, exist_ok=True)
+
+    try:
+        cases = build_cases(scales, data_dir, include_samples, pattern)
+
+        results = []
+        for index, case in enumerate(cases, 1):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(_run_case, case, repeat, data_dir).result()
+            results.append(result)
+            rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else 'n/a'
+            # Progress goes to stderr so the JSON report can be redirected from stdout
+            print(f"⏱️  [{index}/{len(cases)}] {case['name']}: {result['median_seconds']:.3f}s "
+                  f"({result['rows_per_second']:,.0f} rows/s, peak RSS {rss})", file=sys.stderr)
+    finally:
+        if owns_data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {'environment': _environment(), 'results': results}
+
+
+def compare_reports(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Find cases whose throughput dropped by more than threshold against a baseline report
+
+    Returns:
+        One dict per regressed case with both throughputs and the relative change
+    """
+    baseline_by_name = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in current.get('results', []):
+        before = baseline_by_name.get(result['name'])
+        if not before or not before.get('rows_per_second') or not result.get('rows_per_second'):
+            continue
+        change = result['rows_per_second'] / before['rows_per_second'] - 1
+        if change < -threshold:
+            regressions.append({'name': result['name'],
+                                'baseline_rows_per_second': before['rows_per_second'],
+                                'rows_per_second': result['rows_per_second'],
+                                'change': change})
+    return regressions
+
+
+def main():
+    """Command line interface"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the sample data generator and the REG analyzer',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default scales (1k to 1M rows), results to bench.json
+  python benchmark.py --output bench.json
+
+  # Include 10M rows and compare against a previous run
+  python benchmark.py --scales 1000,100000,10000000 --output new.json --compare bench.json
+        """
+    )
+    parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help='Comma-separated synthetic dataset sizes in rows')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Timed repetitions per case (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--filter', dest='pattern',
+                        help='Only run cases whose name contains this text')
+    parser.add_argument('--no-samples', action='store_true',
+                        help='Skip the files in Sample Data/')
+    parser.add_argument('--data-dir',
+                        help='Keep synthetic inputs in this directory and reuse them across runs')
+    parser.add_argument('--output', '-o',
+                        help='Write the JSON report to this file (default: stdout; progress always goes to stderr)')
+    parser.add_argument('--compare',
+                        help='Baseline JSON report; exit with status 1 if any case regressed')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Throughput drop that counts as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(',') if scale]
+    report = run_benchmarks(scales, args.repeat, args.data_dir, args.pattern, not args.no_samples)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
+        print(f"📁 Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        regressions = compare_reports(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"❌ {regression['name']}: {regression['rows_per_second']:,.0f} rows/s "
+                  f"({regression['change']:+.1%} vs {regression['baseline_rows_per_second']:,.0f})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("✅ No throughput regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
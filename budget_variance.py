@@ -0,0 +1,276 @@
+"""
+Vectorized budget-versus-actuals variance analysis.
+
+Computes absolute and percent variance with favorable / unfavorable /
+on-target flags for every row at once. It also rolls variance up per period
+and dimension from summed measures, so the rollups can be built chunk by
+chunk over files far larger than memory. The actuals column may be named
+'Actuals' (generated data) or 'Actual' (SAMPLE300.csv), and the baseline
+can be Budget or Forecast.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analyze_reg import DEFAULT_CHUNK_ROWS, iter_sales_chunks, load_sales_data
+from profiling import span
+from rollup_cube import GRAINS, file_columns, period_keys
+
+# Column names accepted for each role, in order of preference
+ACTUAL_COLUMNS = ['Actuals', 'Actual']
+BASELINE_COLUMNS = ['Budget', 'Forecast']
+
+# Percent variance inside which a row or period counts as on target
+DEFAULT_ON_TARGET_PCT = 2.0
+
+PERFORMANCE_LABELS = ['favorable', 'unfavorable', 'on-target']
+
+# Per-row flag counts carried through rollups
+FLAG_COLUMNS = {'favorable': 'Favorable_Rows', 'unfavorable': 'Unfavorable_Rows', 'on-target': 'On_Target_Rows'}
+
+
+def resolve_columns(columns, actual=None, baseline=None):
+    """
+    Picks the actuals and baseline columns of a schema.
+
+    Args:
+        columns (list): Available columns.
+        actual (str): Actuals column to use; the first of ACTUAL_COLUMNS present if None.
+        baseline (str): Baseline column to use; the first of BASELINE_COLUMNS present if None.
+
+    Returns:
+        tuple: (actual, baseline) column names.
+    """
+    def pick(requested, candidates, role):
+        if requested is not None:
+            if requested not in columns:
+                raise ValueError(f"{role} column not found: {requested}")
+            return requested
+        for candidate in candidates:
+            if candidate in columns:
+                return candidate
+        raise ValueError(f"No {role} column found; expected one of {candidates}")
+
+    return pick(actual, ACTUAL_COLUMNS, 'Actuals'), pick(baseline, BASELINE_COLUMNS, 'Baseline')
+
+
+def classify(variance, variance_pct, on_target_pct=DEFAULT_ON_TARGET_PCT):
+    """
+    Labels variances as favorable, unfavorable or on-target.
+
+    Within on_target_pct percent of the baseline (or exactly on it, for a
+    zero baseline) is on target; otherwise actuals above the baseline are
+    favorable.
+
+    Args:
+        variance (np.ndarray): Actual minus baseline.
+        variance_pct (np.ndarray): Variance as a percentage of the baseline (NaN when the baseline is zero).
+        on_target_pct (float): Width of the on-target band in percent.
+
+    Returns:
+        pd.Categorical: One label per value.
+    """
+    variance = np.asarray(variance, dtype='float64')
+    variance_pct = np.asarray(variance_pct, dtype='float64')
+    on_target = (np.abs(variance_pct) < on_target_pct) | (variance == 0)
+    codes = np.where(on_target, 2, np.where(variance > 0, 0, 1))
+    return pd.Categorical.from_codes(codes, categories=PERFORMANCE_LABELS)
+
+
+def _variance_pct(variance, baseline):
+    """Variance as a percentage of the baseline, NaN where the baseline is zero."""
+    baseline = np.asarray(baseline, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(baseline != 0, np.asarray(variance, dtype='float64') / baseline * 100, np.nan)
+
+
+def add_variance_columns(df, actual=None, baseline=None, on_target_pct=DEFAULT_ON_TARGET_PCT):
+    """
+    Returns a copy of the rows with Variance, Variance_Pct and Performance columns.
+
+    Args:
+        df (pd.DataFrame): Rows with actuals and baseline columns.
+        actual (str): Actuals column (detected if None).
+        baseline (str): Baseline column, 'Budget' or 'Forecast' (detected if None).
+        on_target_pct (float): Width of the on-target band in percent.
+
+    Returns:
+        pd.DataFrame: The rows plus the variance columns.
+    """
+    actual, baseline = resolve_columns(df.columns, actual, baseline)
+    result = df.copy()
+    variance = df[actual].to_numpy(dtype='float64') - df[baseline].to_numpy(dtype='float64')
+    result['Variance'] = variance
+    result['Variance_Pct'] = _variance_pct(variance, df[baseline])
+    result['Performance'] = classify(variance, result['Variance_Pct'].to_numpy(), on_target_pct)
+    return result
+
+
+def _total_row(frame):
+    """Sums every column into a one-row frame, keeping the column dtypes."""
+    return frame.sum().to_frame().T.astype(frame.dtypes.to_dict())
+
+
+def aggregate_variance_inputs(df, by=(), grain='Month', actual='Actuals', baseline='Budget',
+                              on_target_pct=DEFAULT_ON_TARGET_PCT):
+    """
+    Sums actuals and baseline and counts rows by performance per (period, by).
+
+    The output is additive, so partial results from chunks can be summed.
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        by (list): Dimensions to break down by.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        actual (str): Actuals column.
+        baseline (str): Baseline column.
+        on_target_pct (float): Width of the on-target band for the row flags.
+
+    Returns:
+        pd.DataFrame: Period columns, by, <actual>, <baseline>, Count and one
+        *_Rows column per performance label.
+    """
+    with span('aggregate'):
+        df = df[df['Date'].notna()]
+        actuals = df[actual].to_numpy(dtype='float64')
+        baselines = df[baseline].to_numpy(dtype='float64')
+        variance = actuals - baselines
+        performance = classify(variance, _variance_pct(variance, baselines), on_target_pct)
+
+        values = pd.DataFrame({actual: actuals, baseline: baselines, 'Count': 1}, index=df.index)
+        for label, column in FLAG_COLUMNS.items():
+            values[column] = (performance == label).astype('int64')
+
+        keys = period_keys(df['Date'], grain) + [df[dimension] for dimension in by]
+        if not keys:
+            return _total_row(values)
+        return values.groupby(keys, observed=True, dropna=False).sum().reset_index()
+
+
+def finish_variance(sums, actual='Actuals', baseline='Budget', on_target_pct=DEFAULT_ON_TARGET_PCT):
+    """
+    Computes variance, percent variance and performance from summed inputs.
+
+    Args:
+        sums (pd.DataFrame): Output of aggregate_variance_inputs (possibly folded).
+        actual (str): Actuals column.
+        baseline (str): Baseline column.
+        on_target_pct (float): Width of the on-target band in percent.
+
+    Returns:
+        pd.DataFrame: The sums plus Variance, Variance_Pct and Performance.
+    """
+    result = sums.copy()
+    variance = result[actual].to_numpy(dtype='float64') - result[baseline].to_numpy(dtype='float64')
+    result['Variance'] = variance
+    result['Variance_Pct'] = _variance_pct(variance, result[baseline])
+    result['Performance'] = classify(variance, result['Variance_Pct'].to_numpy(), on_target_pct)
+    return result
+
+
+def variance_rollup(df, by=(), grain='Month', actual=None, baseline=None, on_target_pct=DEFAULT_ON_TARGET_PCT):
+    """
+    Rolls budget (or forecast) variance up per period and dimension.
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        by (list): Dimensions to break down by.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        actual (str): Actuals column (detected if None).
+        baseline (str): Baseline column, 'Budget' or 'Forecast' (detected if None).
+        on_target_pct (float): Width of the on-target band in percent.
+
+    Returns:
+        pd.DataFrame: Output of finish_variance.
+    """
+    actual, baseline = resolve_columns(df.columns, actual, baseline)
+    sums = aggregate_variance_inputs(df, list(by), grain, actual, baseline, on_target_pct)
+    return finish_variance(sums, actual, baseline, on_target_pct)
+
+
+def compute_variance(file_path, by=(), grain='Month', actual=None, baseline=None,
+                     on_target_pct=DEFAULT_ON_TARGET_PCT, chunk_rows=None):
+    """
+    Loads a sales file and rolls its variance up per period and dimension.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        by (list): Dimensions to break down by.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        actual (str): Actuals column (detected if None).
+        baseline (str): Baseline column, 'Budget' or 'Forecast' (detected if None).
+        on_target_pct (float): Width of the on-target band in percent.
+        chunk_rows (int): Stream the file in chunks of this many rows.
+
+    Returns:
+        pd.DataFrame: Output of finish_variance.
+    """
+    by = list(by)
+    if not chunk_rows:
+        return variance_rollup(load_sales_data(file_path), by, grain, actual, baseline, on_target_pct)
+
+    actual, baseline = resolve_columns(file_columns(file_path), actual, baseline)
+    sums = None
+    for chunk in iter_sales_chunks(file_path, ['Date'] + by + [actual, baseline], chunk_rows):
+        partial = aggregate_variance_inputs(chunk, by, grain, actual, baseline, on_target_pct)
+        if sums is not None:
+            with span('fold'):
+                partial = pd.concat([sums, partial], ignore_index=True)
+                keys = GRAINS[grain] + by
+                if keys:
+                    partial = partial.groupby(keys, observed=True, dropna=False).sum().reset_index()
+                else:
+                    partial = _total_row(partial)
+        sums = partial
+    if sums is None:
+        raise ValueError(f"No rows in {file_path}")
+    return finish_variance(sums, actual, baseline, on_target_pct)
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Budget (or forecast) versus actuals variance by period and dimension.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--by', default='',
+                        help='Comma-separated dimensions to break down by, e.g. Category,Region')
+    parser.add_argument('--grain', choices=list(GRAINS), default='Month',
+                        help='Time grain (default: Month)')
+    parser.add_argument('--baseline', choices=BASELINE_COLUMNS,
+                        help='Column to compare actuals against (default: Budget when present)')
+    parser.add_argument('--on-target-pct', type=float, default=DEFAULT_ON_TARGET_PCT,
+                        help=f'Percent band counted as on target (default: {DEFAULT_ON_TARGET_PCT})')
+    parser.add_argument('--chunk-rows', type=int, nargs='?', const=DEFAULT_CHUNK_ROWS,
+                        help='Stream the file in chunks of N rows')
+    parser.add_argument('--output', '-o',
+                        help='Also write the result to a .csv or .parquet file')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    by = [dimension for dimension in args.by.split(',') if dimension]
+    with span('variance'):
+        result = compute_variance(args.file_path, by, args.grain, baseline=args.baseline,
+                                  on_target_pct=args.on_target_pct, chunk_rows=args.chunk_rows)
+
+    with pd.option_context('display.float_format', '{:,.2f}'.format):
+        print(result.to_string(index=False))
+    if args.output:
+        if Path(args.output).suffix.lower() == '.parquet':
+            result.to_parquet(args.output, index=False)
+        else:
+            result.to_csv(args.output, index=False)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
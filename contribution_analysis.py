@@ -0,0 +1,239 @@
+"""
+Hierarchical contribution and Pareto analysis.
+
+Rows are aggregated once to the leaf level of a hierarchy (Category ->
+Product, Region -> Country -> State -> City) per period. Every coarser level
+is rolled up from that small table. Shares of parent and of period total,
+ranks within parent, cumulative Pareto shares and ABC classes are then
+computed for all periods and levels with grouped transforms, not loops.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analyze_reg import DEFAULT_CHUNK_ROWS, iter_sales_chunks, load_sales_data, measure_columns, measure_values
+from profiling import span
+from rollup_cube import GRAINS, HIERARCHIES, file_columns, period_keys
+
+# Cumulative share (in percent) closing the A and B classes of a Pareto split
+DEFAULT_PARETO_CUTOFFS = (80.0, 95.0)
+
+
+def hierarchy_levels(name, columns):
+    """
+    Lists the levels of a named hierarchy present in a schema.
+
+    Args:
+        name (str): Key of rollup_cube.HIERARCHIES, e.g. 'Product' or 'Geography'.
+        columns (list): Columns of the data.
+
+    Returns:
+        list: Level columns, coarsest first.
+    """
+    if name not in HIERARCHIES:
+        raise ValueError(f"Unknown hierarchy: {name}")
+    levels = [level for level in HIERARCHIES[name] if level in columns]
+    if not levels:
+        raise ValueError(f"No {name} hierarchy columns found; expected some of {HIERARCHIES[name]}")
+    return levels
+
+
+def aggregate_leaves(df, levels, measure='Actuals', grain='Month'):
+    """
+    Sums a measure per (period, full hierarchy path).
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        levels (list): Hierarchy columns, coarsest first.
+        measure (str): Measure to sum, or a key of DERIVED_MEASURES.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+
+    Returns:
+        pd.DataFrame: Period columns, levels and <measure>.
+    """
+    with span('aggregate'):
+        df = df[df['Date'].notna()]
+        keys = period_keys(df['Date'], grain) + [df[level] for level in levels]
+        return measure_values(df, measure).groupby(keys, observed=True, dropna=False).sum().reset_index()
+
+
+def contribution_table(leaves, levels, measure='Actuals', grain='Month', cutoffs=DEFAULT_PARETO_CUTOFFS):
+    """
+    Computes shares and Pareto positions for every node of a hierarchy in every period.
+
+    Args:
+        leaves (pd.DataFrame): Output of aggregate_leaves.
+        levels (list): Hierarchy columns, coarsest first.
+        measure (str): Measure column of leaves.
+        grain (str): Grain of leaves.
+        cutoffs (tuple): Cumulative shares (percent) closing the A and B classes.
+
+    Returns:
+        pd.DataFrame: One row per (period, node) with the period columns, the
+        path columns (null below the node's level), Level, <measure>,
+        Share_Of_Parent, Share_Of_Total, Rank (within parent),
+        Cumulative_Share (within parent, largest first) and Pareto_Class.
+    """
+    period_columns = GRAINS[grain]
+    frames = []
+    with span('contribution'):
+        for depth, level in enumerate(levels):
+            path = levels[:depth + 1]
+            parent_keys = period_columns + levels[:depth]
+            nodes = leaves.groupby(period_columns + path, observed=True, dropna=False)[measure].sum().reset_index()
+
+            values = nodes[measure]
+            parent_total = values.groupby([nodes[k] for k in parent_keys], dropna=False).transform('sum') \
+                if parent_keys else pd.Series(values.sum(), index=nodes.index)
+            period_total = values.groupby([nodes[k] for k in period_columns], dropna=False).transform('sum') \
+                if period_columns else pd.Series(values.sum(), index=nodes.index)
+
+            # Largest first within each parent; ties keep member order
+            nodes = nodes.assign(_parent_total=parent_total, _period_total=period_total)
+            nodes = nodes.sort_values(parent_keys + [measure], ascending=[True] * len(parent_keys) + [False],
+                                      kind='stable').reset_index(drop=True)
+            parent_groups = nodes.groupby(parent_keys, dropna=False, sort=False) if parent_keys else None
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                nodes['Share_Of_Parent'] = nodes[measure] / nodes['_parent_total'] * 100
+                nodes['Share_Of_Total'] = nodes[measure] / nodes['_period_total'] * 100
+            if parent_groups is not None:
+                nodes['Rank'] = parent_groups.cumcount() + 1
+                nodes['Cumulative_Share'] = parent_groups['Share_Of_Parent'].cumsum()
+            else:
+                nodes['Rank'] = np.arange(1, len(nodes) + 1)
+                nodes['Cumulative_Share'] = nodes['Share_Of_Parent'].cumsum()
+
+            # A node is in class A if the share before it is still under the first cutoff
+            share_before = nodes['Cumulative_Share'] - nodes['Share_Of_Parent']
+            nodes['Pareto_Class'] = np.select([share_before < cutoffs[0], share_before < cutoffs[1]], ['A', 'B'], 'C')
+            nodes.insert(len(period_columns), 'Level', level)
+            frames.append(nodes.drop(columns=['_parent_total', '_period_total']))
+
+        table = pd.concat(frames, ignore_index=True)
+    return table[period_columns + ['Level'] + levels + [measure, 'Share_Of_Parent', 'Share_Of_Total', 'Rank',
+                                                        'Cumulative_Share', 'Pareto_Class']]
+
+
+def pareto_summary(table, levels, measure='Actuals', grain='Month', cutoff=DEFAULT_PARETO_CUTOFFS[0]):
+    """
+    Counts, per period and level, how many nodes make up cutoff percent of the total.
+
+    Args:
+        table (pd.DataFrame): Output of contribution_table.
+        levels (list): Hierarchy columns of the table.
+        measure (str): Measure column of the table.
+        grain (str): Grain of the table.
+        cutoff (float): Cumulative share in percent, e.g. 80 for an 80/20 check.
+
+    Returns:
+        pd.DataFrame: Period columns, Level, Members, Members_To_Cutoff and
+        Member_Pct (the share of members needed).
+    """
+    period_columns = GRAINS[grain]
+    keys = period_columns + ['Level']
+    ordered = table.sort_values(keys + ['Share_Of_Total'], ascending=[True] * len(keys) + [False], kind='stable')
+    grouped = ordered.groupby(keys, sort=False)
+    share_before = grouped['Share_Of_Total'].cumsum() - ordered['Share_Of_Total']
+    ordered = ordered.assign(_needed=share_before < cutoff)
+
+    summary = ordered.groupby(keys, sort=False).agg(Members=(measure, 'size'), Members_To_Cutoff=('_needed', 'sum'))
+    summary['Member_Pct'] = summary['Members_To_Cutoff'] / summary['Members'] * 100
+    summary = summary.reset_index()
+    level_order = summary['Level'].map({level: i for i, level in enumerate(levels)})
+    return summary.assign(_order=level_order).sort_values(period_columns + ['_order'], kind='stable') \
+        .drop(columns='_order').reset_index(drop=True)
+
+
+def compute_contribution(file_path, hierarchy='Product', measure='Actuals', grain='Month',
+                         cutoffs=DEFAULT_PARETO_CUTOFFS, chunk_rows=None):
+    """
+    Loads a sales file and computes its contribution table for one hierarchy.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        hierarchy (str): 'Product' or 'Geography' (see rollup_cube.HIERARCHIES).
+        measure (str): Measure to sum, or a key of DERIVED_MEASURES.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+        cutoffs (tuple): Cumulative shares (percent) closing the A and B classes.
+        chunk_rows (int): Stream the file in chunks of this many rows.
+
+    Returns:
+        tuple: (contribution table, hierarchy levels).
+    """
+    if not chunk_rows:
+        df = load_sales_data(file_path)
+        levels = hierarchy_levels(hierarchy, df.columns)
+        leaves = aggregate_leaves(df, levels, measure, grain)
+        return contribution_table(leaves, levels, measure, grain, cutoffs), levels
+
+    levels = hierarchy_levels(hierarchy, file_columns(file_path))
+    leaves = None
+    for chunk in iter_sales_chunks(file_path, ['Date'] + levels + measure_columns(measure), chunk_rows):
+        partial = aggregate_leaves(chunk, levels, measure, grain)
+        if leaves is not None:
+            with span('fold'):
+                partial = pd.concat([leaves, partial], ignore_index=True)
+                partial = partial.groupby(GRAINS[grain] + levels, observed=True, dropna=False)[measure].sum().reset_index()
+        leaves = partial
+    if leaves is None:
+        raise ValueError(f"No rows in {file_path}")
+    return contribution_table(leaves, levels, measure, grain, cutoffs), levels
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Hierarchical contribution shares and Pareto (80/20) analysis.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--hierarchy', choices=list(HIERARCHIES), default='Product',
+                        help='Hierarchy to analyze (default: Product, i.e. Category > Product)')
+    parser.add_argument('--measure', default='Actuals',
+                        help='Actuals or Budget (default: Actuals)')
+    parser.add_argument('--grain', choices=list(GRAINS), default='All',
+                        help='Period grain (default: All)')
+    parser.add_argument('--cutoff', type=float, default=DEFAULT_PARETO_CUTOFFS[0],
+                        help=f'Cumulative share closing class A, in percent (default: {DEFAULT_PARETO_CUTOFFS[0]:g})')
+    parser.add_argument('--chunk-rows', type=int, nargs='?', const=DEFAULT_CHUNK_ROWS,
+                        help='Stream the file in chunks of N rows')
+    parser.add_argument('--output', '-o',
+                        help='Write the full contribution table to a .csv or .parquet file')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    cutoffs = (args.cutoff, max(args.cutoff, DEFAULT_PARETO_CUTOFFS[1]))
+    table, levels = compute_contribution(args.file_path, args.hierarchy, args.measure, args.grain,
+                                         cutoffs, args.chunk_rows)
+    summary = pareto_summary(table, levels, args.measure, args.grain, args.cutoff)
+
+    with pd.option_context('display.float_format', '{:,.2f}'.format):
+        print(f"📊 Members making up {args.cutoff:g}% of {args.measure}")
+        print(summary.to_string(index=False))
+        top_level = table[(table['Level'] == levels[0]) & (table['Pareto_Class'] == 'A')]
+        if not top_level.empty:
+            last_period = top_level[GRAINS[args.grain]].iloc[-1] if GRAINS[args.grain] else None
+            if last_period is not None:
+                top_level = top_level[(top_level[GRAINS[args.grain]] == last_period).all(axis=1)]
+            print(f"\nClass A {levels[0]} (latest period):")
+            print(top_level[[levels[0], args.measure, 'Share_Of_Total', 'Cumulative_Share']].to_string(index=False))
+
+    if args.output:
+        if Path(args.output).suffix.lower() == '.parquet':
+            table.to_parquet(args.output, index=False)
+        else:
+            table.to_csv(args.output, index=False)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Prefix-sum index over daily totals for arbitrary date-range queries.
+
+The index holds, for every member of one dimension, the running sum of a
+measure (and of the row count) by day. The total of any inclusive date
+window is then the difference of two rows of that table, for all members
+at once, instead of a filter and groupby over the raw rows. Trailing
+windows, fiscal quarters and promo periods all cost the same two lookups.
+When most (day, member) pairs have no rows, only the running sums at days
+with rows are kept, and each lookup is a binary search.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analyze_reg import (DEFAULT_CHUNK_ROWS, iter_sales_chunks, load_sales_data, measure_columns,
+                         measure_values, top_n_by_period)
+from profiling import span
+
+# The index uses dense (day x member) tables while they have at most this many cells per daily total
+DENSE_INDEX_FILL = 4
+
+
+def aggregate_by_day(df, dimension='Product', measure='Actuals'):
+    """
+    Sums a measure and counts rows per (Date, dimension).
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        dimension (str): Column to break the measure down by.
+        measure (str): Numeric column to sum, or a key of DERIVED_MEASURES.
+
+    Returns:
+        pd.DataFrame: Columns Date (normalized to midnight), <dimension>, <measure>, Count.
+    """
+    with span('aggregate'):
+        df = df[df['Date'].notna()]
+        keys = [df['Date'].dt.normalize(), df[dimension]]
+        grouped = measure_values(df, measure).groupby(keys, observed=True)
+        daily = grouped.sum().to_frame()
+        daily['Count'] = grouped.size()
+        return daily.reset_index()
+
+
+class DateRangeIndex:
+    """
+    Daily prefix sums of a measure per member of a dimension.
+
+    Row d of the cumulative tables holds the totals of every day before
+    start + d, so cumulative[0] is all zeros. Sparse indexes (keys given)
+    store only the rows where a member's totals change: entry i holds the
+    member's running totals through its day, and keys[i] is
+    member * (days + 1) + row, sorted.
+
+    Args:
+        start (np.datetime64): First day covered, at day precision.
+        members (np.ndarray): Member names, one per column.
+        cumulative (np.ndarray): (days + 1, members) running sums of the
+            measure, or one running sum per entry when sparse.
+        counts (np.ndarray): Running row counts, shaped like cumulative.
+        dimension (str): Dimension the members belong to.
+        measure (str): Measure that was summed.
+        keys (np.ndarray): Sorted entry keys of a sparse index; None when dense.
+        n_days (int): Days covered; required when sparse.
+    """
+
+    def __init__(self, start, members, cumulative, counts, dimension='Product', measure='Actuals',
+                 keys=None, n_days=None):
+        self.start = start
+        self.members = members
+        self.cumulative = cumulative
+        self.counts = counts
+        self.dimension = dimension
+        self.measure = measure
+        self.keys = keys
+        self.n_days = len(cumulative) - 1 if keys is None else n_days
+
+    @classmethod
+    def from_daily(cls, daily, dimension='Product', measure='Actuals'):
+        """
+        Builds the index from an aggregate_by_day table.
+
+        The index is sparse when the dense tables would have more than
+        DENSE_INDEX_FILL cells per row of daily.
+
+        Args:
+            daily (pd.DataFrame): Output of aggregate_by_day.
+            dimension (str): Dimension column of the table.
+            measure (str): Measure column of the table.
+
+        Returns:
+            DateRangeIndex: The built index.
+        """
+        with span('build_index'):
+            days = daily['Date'].to_numpy().astype('datetime64[D]')
+            member_codes, members = pd.factorize(daily[dimension], sort=True)
+            members = np.asarray(members, dtype=object)
+            if len(days):
+                start = days.min()
+                day_codes = (days - start).astype(np.int64)
+                n_days = int(day_codes.max()) + 1
+            else:
+                start, day_codes, n_days = np.datetime64('1970-01-01', 'D'), np.zeros(0, np.int64), 0
+
+            if (n_days + 1) * len(members) > DENSE_INDEX_FILL * max(len(daily), 1):
+                keys = member_codes * (n_days + 1) + day_codes + 1
+                order = np.argsort(keys, kind='stable')
+                by_member = member_codes[order]
+                cumulative = pd.Series(daily[measure].to_numpy(dtype='float64')[order]).groupby(by_member).cumsum()
+                counts = pd.Series(daily['Count'].to_numpy(dtype=np.int64)[order]).groupby(by_member).cumsum()
+                return cls(start, members, cumulative.to_numpy(), counts.to_numpy(), dimension, measure,
+                           keys=keys[order], n_days=n_days)
+
+            cumulative = np.zeros((n_days + 1, len(members)))
+            counts = np.zeros((n_days + 1, len(members)), dtype=np.int64)
+            np.add.at(cumulative, (day_codes + 1, member_codes), daily[measure].to_numpy(dtype='float64'))
+            np.add.at(counts, (day_codes + 1, member_codes), daily['Count'].to_numpy())
+            np.cumsum(cumulative, axis=0, out=cumulative)
+            np.cumsum(counts, axis=0, out=counts)
+        return cls(start, members, cumulative, counts, dimension, measure)
+
+    @classmethod
+    def from_frame(cls, df, dimension='Product', measure='Actuals'):
+        """Builds the index from parsed sales rows."""
+        return cls.from_daily(aggregate_by_day(df, dimension, measure), dimension, measure)
+
+    @classmethod
+    def from_file(cls, file_path, dimension='Product', measure='Actuals', chunk_rows=None):
+        """
+        Builds the index from a sales file, optionally streaming it in chunks.
+
+        Args:
+            file_path (str): Path to a .csv, .parquet or .feather file.
+            dimension (str): Column to index.
+            measure (str): Measure to sum.
+            chunk_rows (int): Rows read per chunk; the whole file is loaded if None.
+
+        Returns:
+            DateRangeIndex: The built index.
+        """
+        if not chunk_rows:
+            return cls.from_frame(load_sales_data(file_path), dimension, measure)
+
+        daily = None
+        columns = ['Date', dimension] + measure_columns(measure)
+        for chunk in iter_sales_chunks(file_path, columns, chunk_rows):
+            partial = aggregate_by_day(chunk, dimension, measure)
+            if daily is not None:
+                with span('fold'):
+                    partial = pd.concat([daily, partial], ignore_index=True)
+                    partial = partial.groupby(['Date', dimension], observed=True)[[measure, 'Count']].sum().reset_index()
+            daily = partial
+        if daily is None:
+            daily = pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), dimension: pd.Series(dtype=str),
+                                  measure: pd.Series(dtype='float64'), 'Count': pd.Series(dtype='int64')})
+        return cls.from_daily(daily, dimension, measure)
+
+    @property
+    def end(self):
+        """Last day covered by the index."""
+        return self.start + (self.n_days - 1)
+
+    def _bounds(self, starts, ends):
+        """Converts inclusive date bounds to clipped prefix-table rows."""
+        starts = np.asarray(pd.to_datetime(np.atleast_1d(starts)).to_numpy().astype('datetime64[D]'))
+        ends = np.asarray(pd.to_datetime(np.atleast_1d(ends)).to_numpy().astype('datetime64[D]'))
+        lo = np.clip((starts - self.start).astype(np.int64), 0, self.n_days)
+        hi = np.clip((ends - self.start).astype(np.int64) + 1, 0, self.n_days)
+        return lo, np.maximum(hi, lo)
+
+    def _prefix(self, rows):
+        """Running totals and counts of every member before each prefix-table row, as (rows, members) arrays."""
+        if self.keys is None:
+            return self.cumulative[rows], self.counts[rows]
+        # Last entry of each member at or before the row, if the member has one
+        member_base = np.arange(len(self.members)) * (self.n_days + 1)
+        queries = member_base[None, :] + rows[:, None]
+        positions = np.searchsorted(self.keys, queries, side='right') - 1
+        found = (positions >= 0) & (self.keys[np.maximum(positions, 0)] > member_base[None, :])
+        positions = np.maximum(positions, 0)
+        return (np.where(found, self.cumulative[positions], 0.0),
+                np.where(found, self.counts[positions], 0))
+
+    def window_totals(self, starts, ends):
+        """
+        Totals of every member over many inclusive date windows at once.
+
+        Args:
+            starts: First day of each window (anything pd.to_datetime accepts).
+            ends: Last day of each window.
+
+        Returns:
+            tuple: (windows, members) arrays of measure totals and of row counts.
+        """
+        lo, hi = self._bounds(starts, ends)
+        (values_hi, counts_hi), (values_lo, counts_lo) = self._prefix(hi), self._prefix(lo)
+        return values_hi - values_lo, counts_hi - counts_lo
+
+    def totals(self, start, end):
+        """
+        Totals of every member over one inclusive date window.
+
+        Args:
+            start: First day of the window.
+            end: Last day of the window.
+
+        Returns:
+            pd.Series: Measure total per member, for members with rows in the window.
+        """
+        values, counts = self.window_totals(start, end)
+        present = counts[0] > 0
+        return pd.Series(values[0][present], index=pd.Index(self.members[present], name=self.dimension),
+                         name=self.measure)
+
+    def total(self, start, end, member=None):
+        """
+        Total of one member, or of all members, over an inclusive date window.
+
+        Args:
+            start: First day of the window.
+            end: Last day of the window.
+            member (str): Member to total; every member when None.
+
+        Returns:
+            float: The total.
+        """
+        values, _ = self.window_totals(start, end)
+        if member is None:
+            return float(values[0].sum())
+        column = np.flatnonzero(self.members == member)
+        if not len(column):
+            raise KeyError(f"Unknown {self.dimension}: {member}")
+        return float(values[0][column[0]])
+
+    def top_bottom(self, windows, n=10):
+        """
+        Ranks the top n and bottom n members of each date window.
+
+        Args:
+            windows (list): (start, end) pairs of inclusive window bounds.
+            n (int): Members to return from each end of every window.
+
+        Returns:
+            pd.DataFrame: Start, End, Direction, Rank, <dimension>, <measure>
+            and Percentage of the window total, as from top_n_by_period. A
+            window listed more than once is ranked once.
+        """
+        # Rows are grouped by their day labels, so repeated windows would be summed together
+        labels = [(pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d'))
+                  for start, end in windows]
+        starts, ends = zip(*dict.fromkeys(labels)) if labels else ((), ())
+        values, counts = self.window_totals(list(starts), list(ends))
+        window_rows, member_cols = np.nonzero(counts > 0)
+        table = pd.DataFrame({
+            'Start': np.asarray(starts, dtype=object)[window_rows],
+            'End': np.asarray(ends, dtype=object)[window_rows],
+            self.dimension: self.members[member_cols],
+            self.measure: values[window_rows, member_cols],
+        })
+        with span('rank'):
+            return top_n_by_period(table, ['Start', 'End'], self.dimension, self.measure, n)
+
+
+def _parse_window(text, index):
+    """Parses 'START:END' or 'last:DAYS' (ending on the index's last day) into a (start, end) pair."""
+    first, sep, second = text.partition(':')
+    if not sep:
+        raise ValueError(f"Windows must look like START:END or last:DAYS, got: {text}")
+    if first == 'last':
+        end = pd.Timestamp(index.end)
+        return end - pd.Timedelta(days=int(second) - 1), end
+    return pd.Timestamp(first), pd.Timestamp(second)
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Totals and rankings over arbitrary date windows.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('windows', nargs='+', metavar='WINDOW',
+                        help="Inclusive date window, START:END (e.g. 2024-07-01:2024-09-15) or last:DAYS")
+    parser.add_argument('--dimension', default='Product',
+                        help='Column to index (default: Product)')
+    parser.add_argument('--measure', default='Actuals',
+                        help='Actuals, Budget or Variance (default: Actuals)')
+    parser.add_argument('--top', type=int, default=5, metavar='N',
+                        help='Members to list from each end of every window (default: 5)')
+    parser.add_argument('--chunk-rows', type=int, nargs='?', const=DEFAULT_CHUNK_ROWS,
+                        help='Stream the file in chunks of N rows while building the index')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    index = DateRangeIndex.from_file(args.file_path, args.dimension, args.measure, args.chunk_rows)
+    try:
+        windows = [_parse_window(text, index) for text in args.windows]
+    except ValueError as e:
+        parser.error(str(e))
+
+    with span('query'):
+        rankings = index.top_bottom(windows, args.top)
+    for start, end in windows:
+        label_start, label_end = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+        print(f"\n{label_start} to {label_end}: {args.measure} ${index.total(start, end):,.2f}")
+        picks = rankings[(rankings['Start'] == label_start) & (rankings['End'] == label_end)]
+        for direction in ('Top', 'Bottom'):
+            print(f"  {direction} {args.dimension}:")
+            for pick in picks[picks['Direction'] == direction].itertuples(index=False):
+                print(f"    {pick.Rank}. {getattr(pick, args.dimension)} - {args.measure}: "
+                      f"${getattr(pick, args.measure):,.2f}, Percentage: {pick.Percentage:.2f}%")
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,24 @@ Generates realistic financial data with AI-suggested products and categories
 import pandas as pd
 import numpy as np
 import argparse
+import contextlib
 import sys
 import json
 import requests
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
-import random
+from typing import List, Dict, Tuple, Optional, Iterator
 import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+import profiling
+from analysis_cache import AnalysisCache
+from profiling import ProgressReporter, span
+
 # Sample data definitions
 STATES_CITIES = {
     'Alabama': ['Birmingham', 'Mobile', 'Montgomery'],
@@ -99,11 +108,150 @@ DEFAULT_CATEGORIES = [
 
 CHANNELS = ['Online', 'Retail', 'Direct Sales', 'Partner', 'Wholesale']
 
+# Budget generation tables (shared by every row, so built once at import time)
+BUDGET_RANGES = {
+    'restaurant': (5000, 50000),
+    'fitness': (10000, 80000),
+    'tech': (20000, 200000),
+    'fashion': (8000, 60000),
+    'automotive': (15000, 150000),
+    'beauty': (5000, 40000),
+    'home': (10000, 100000),
+    'general': (8000, 80000)
+}
+
+# Coastal/major states are more expensive
+MAJOR_STATES = ['California', 'New York', 'Texas', 'Florida', 'Illinois']
+MAJOR_STATE_MULTIPLIER = (1.1, 1.4)
+
+CHANNEL_MULTIPLIERS = {
+    'Online': (0.8, 1.2),
+    'Retail': (0.9, 1.1),
+    'Direct Sales': (1.1, 1.4),
+    'Partner': (0.7, 1.0),
+    'Wholesale': (0.6, 0.9)
+}
+
+# The same tables indexed by state / channel code
+IS_MAJOR_STATE = np.isin(list(STATES_CITIES.keys()), MAJOR_STATES)
+CHANNEL_LOW = np.array([CHANNEL_MULTIPLIERS[c][0] for c in CHANNELS])
+CHANNEL_HIGH = np.array([CHANNEL_MULTIPLIERS[c][1] for c in CHANNELS])
+
+# Actuals variance (-25% to +40% for more realistic business data)
+ACTUALS_VARIANCE = (0.75, 1.4)
+
+# Largest row count built in memory; bigger datasets stream with a chunk size or workers
+MAX_RECORDS = 10_000_000
+
+OUTPUT_COLUMNS = ['Date', 'Product', 'Category', 'State', 'City', 'Budget', 'Actuals', 'Channel']
+
+# Rows per chunk when shards stream to disk and no --chunk-size is given
+DEFAULT_CHUNK_SIZE = 500_000
+
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+# Local Ollama-compatible endpoint and model used for AI product catalogs
+DEFAULT_LLM_URL = 'http://localhost:11434/api/generate'
+DEFAULT_LLM_MODEL = 'llama3.1'
+
+# (connect, read) timeouts in seconds for one catalog request
+LLM_TIMEOUT = (3.05, 120)
+
+# Catalog requests in flight at once (also the HTTP connection pool size)
+DEFAULT_LLM_CONCURRENCY = 8
+
+CATALOG_PROMPT = """You are generating sample data for a business described as: "{business_type}".
+Suggest 5 product categories and 15 realistic products (3 per category) it would sell.
+Respond with JSON only, in the form:
+{{"categories": ["Category", ...], "products": [{{"name": "Product", "category": "Category"}}, ...]}}"""
+
+# AI catalogs are cached on disk by normalized business type
+DEFAULT_CATALOG_CACHE_DIR = '.catalog_cache'
+DEFAULT_CATALOG_TTL_HOURS = 7 * 24
+CATALOG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def normalize_business_type(business_type: str) -> str:
+    """Canonical form of a business description for cache keys ('Tech  Startup!' -> 'tech startup')"""
+    return ' '.join(re.findall(r"[a-z0-9&']+", business_type.lower()))
+
+def _parse_catalog(text: str) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """
+    Parse and check the JSON catalog returned by the LLM
+    
+    Returns:
+        Tuple of (products, categories, product_category_mapping)
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM response is not JSON: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get('products'), list):
+        raise ValueError("LLM response has no product list")
+    
+    mapping = {}
+    for item in data['products']:
+        if not isinstance(item, dict):
+            continue
+        name = str(item.get('name') or '').strip()
+        category = str(item.get('category') or '').strip()
+        if name and category and name not in mapping:
+            mapping[name] = category
+    if len(mapping) < 3:
+        raise ValueError(f"LLM suggested only {len(mapping)} usable products")
+    
+    # Listed categories first (those that have products), then any others the products use
+    listed = [str(c).strip() for c in data.get('categories') or [] if isinstance(c, str)]
+    used = set(mapping.values())
+    categories = list(dict.fromkeys([c for c in listed if c in used] + list(mapping.values())))
+    return list(mapping), categories, mapping
+
+class CatalogCache:
+    """Product catalogs on disk, keyed by normalized business type and model, that expire after a TTL"""
+    
+    def __init__(self, cache_dir: str = DEFAULT_CATALOG_CACHE_DIR, ttl_hours: float = DEFAULT_CATALOG_TTL_HOURS,
+                 max_bytes: int = CATALOG_CACHE_MAX_BYTES):
+        # Least recently used catalogs are evicted once the directory exceeds max_bytes
+        self.store = AnalysisCache(cache_dir, max_bytes=max_bytes)
+        self.ttl_seconds = ttl_hours * 3600
+    
+    def _key(self, business_type: str, model: str) -> str:
+        return self.store.key('catalog', business_type=normalize_business_type(business_type), model=model)
+    
+    def get(self, business_type: str, model: str) -> Optional[Tuple[List[str], List[str], Dict[str, str]]]:
+        """Cached catalog, or None if there is none or it is older than the TTL"""
+        entry = self.store.get(self._key(business_type, model))
+        if entry is None or time.time() - entry['created'] > self.ttl_seconds:
+            return None
+        return entry['catalog']
+    
+    def put(self, business_type: str, model: str, catalog: Tuple[List[str], List[str], Dict[str, str]]) -> None:
+        self.store.put(self._key(business_type, model), {'created': time.time(), 'catalog': catalog})
+
 class AIProductGenerator:
     """Generate products and categories using AI/LLM"""
     
-    def __init__(self):
+    def __init__(self,
+                 llm_url: Optional[str] = None,
+                 model: str = DEFAULT_LLM_MODEL,
+                 cache: Optional[CatalogCache] = None,
+                 timeout: Tuple[float, float] = LLM_TIMEOUT,
+                 max_concurrency: int = DEFAULT_LLM_CONCURRENCY):
+        """
+        Args:
+            llm_url: Ollama-compatible /api/generate endpoint; without one, AI
+                generation uses the keyword-based catalogs below
+            model: Model name sent with every request
+            cache: On-disk catalog cache (None to always ask the LLM)
+            timeout: (connect, read) timeout in seconds per request
+            max_concurrency: Catalog requests in flight at once
+        """
         self.fallback_data = self._create_fallback_mapping()
+        self.llm_url = llm_url
+        self.model = model
+        self.cache = cache
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._session = None
     
     def _create_fallback_mapping(self) -> Dict[str, str]:
         """Create fallback product-category mapping"""
@@ -145,11 +293,87 @@ class AIProductGenerator:
         else:
             return self._generate_smart_fallback(business_type)
     
+    def generate_catalogs(self, business_types: List[str], use_ai: bool = True) -> Dict[str, Tuple[List[str], List[str], Dict[str, str]]]:
+        """
+        Generate catalogs for many business types, asking the LLM concurrently
+        
+        Business types that normalize to the same text share one request, and
+        cached catalogs are not requested at all. A failed request falls back
+        to the keyword-based catalog for that business type only.
+        
+        Args:
+            business_types: Descriptions of the businesses
+            use_ai: Whether to use AI generation
+            
+        Returns:
+            Dict of business type (as given) to (products, categories, product_category_mapping)
+        """
+        if not use_ai or not self.llm_url:
+            return {business_type: self.generate_products_and_categories(business_type, use_ai)
+                    for business_type in business_types}
+        
+        catalogs = {}
+        pending = {}
+        for business_type in business_types:
+            cached = self.cache.get(business_type, self.model) if self.cache else None
+            if cached is not None:
+                catalogs[normalize_business_type(business_type)] = cached
+            else:
+                pending.setdefault(normalize_business_type(business_type), business_type)
+        
+        if pending:
+            # Built here, not lazily in the workers, so they all share one connection pool
+            session = self.session
+            with span('llm_catalogs'), ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pending))) as pool:
+                futures = {key: pool.submit(self._request_catalog, business_type, session)
+                           for key, business_type in pending.items()}
+                for key, future in futures.items():
+                    try:
+                        catalogs[key] = self._store(pending[key], future.result())
+                    except Exception as e:
+                        print(f"⚠️  AI generation failed for '{pending[key]}' ({e}), using smart fallback...")
+                        catalogs[key] = self._generate_smart_fallback(pending[key])
+        
+        return {business_type: catalogs[normalize_business_type(business_type)] for business_type in business_types}
+    
     def _generate_with_ai(self, business_type: str) -> Tuple[List[str], List[str], Dict[str, str]]:
-        """Generate using AI/LLM (placeholder for actual implementation)"""
-        # This is where you would integrate with an actual LLM API
-        # For now, we'll use a smart local generation that simulates AI
-        return self._generate_smart_fallback(business_type)
+        """Generate using the configured LLM endpoint, through the catalog cache"""
+        if not self.llm_url:
+            # No endpoint configured: use the smart local generation that simulates AI
+            return self._generate_smart_fallback(business_type)
+        
+        cached = self.cache.get(business_type, self.model) if self.cache else None
+        if cached is not None:
+            return cached
+        with span('llm_catalogs'):
+            return self._store(business_type, self._request_catalog(business_type))
+    
+    def _store(self, business_type: str, catalog: Tuple[List[str], List[str], Dict[str, str]]) -> Tuple[List[str], List[str], Dict[str, str]]:
+        """Save a fresh catalog to the cache, if any, and return it"""
+        if self.cache:
+            self.cache.put(business_type, self.model, catalog)
+        return catalog
+    
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session whose connection pool is shared by concurrent catalog requests"""
+        if self._session is None:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+            self._session = requests.Session()
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+    
+    def _request_catalog(self, business_type: str, session: Optional[requests.Session] = None) -> Tuple[List[str], List[str], Dict[str, str]]:
+        """Ask the LLM endpoint for one catalog (Ollama /api/generate, non-streaming JSON)"""
+        response = (session or self.session).post(self.llm_url, timeout=self.timeout, json={
+            'model': self.model,
+            'prompt': CATALOG_PROMPT.format(business_type=business_type),
+            'format': 'json',
+            'stream': False
+        })
+        response.raise_for_status()
+        return _parse_catalog(response.json().get('response', ''))
     
     def _generate_smart_fallback(self, business_type: str) -> Tuple[List[str], List[str], Dict[str, str]]:
         """Generate products and categories based on business type keywords"""
@@ -328,11 +552,18 @@ class AIProductGenerator:
 class SampleDataGenerator:
     """Generate realistic sample CSV data for financial analysis"""
     
-    def __init__(self):
-        """Initialize the generator with random seed for reproducibility"""
-        random.seed(42)
-        np.random.seed(42)
-        self.ai_generator = AIProductGenerator()
+    def __init__(self, seed=42, ai_generator: Optional[AIProductGenerator] = None):
+        """
+        Initialize the generator with random seed for reproducibility
+        
+        Args:
+            seed: Master seed (int or np.random.SeedSequence). Worker shards
+                get independent streams spawned from it.
+            ai_generator: Catalog generator to use (default: keyword-based, no LLM)
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.ai_generator = ai_generator or AIProductGenerator()
     
     def interactive_setup(self) -> Dict:
         """Interactive setup for data generation parameters"""
@@ -367,11 +598,11 @@ class SampleDataGenerator:
         print("\n📊 Step 3: Data Volume")
         while True:
             try:
-                records = int(input("How many records do you want to generate? (50-10000): "))
-                if 50 <= records <= 10000:
+                records = int(input(f"How many records do you want to generate? (50-{MAX_RECORDS}): "))
+                if 50 <= records <= MAX_RECORDS:
                     break
                 else:
-                    print("Please enter a number between 50 and 10000")
+                    print(f"Please enter a number between 50 and {MAX_RECORDS}")
             except ValueError:
                 print("Please enter a valid number")
         
@@ -410,7 +641,10 @@ class SampleDataGenerator:
                      products: List[str],
                      product_mapping: Dict[str, str],
                      output_file: str,
-                     business_type: str = "general") -> None:
+                     business_type: str = "general",
+                     chunk_size: Optional[int] = None,
+                     workers: int = 1,
+                     output_format: str = 'csv') -> Optional[pd.DataFrame]:
         """
         Generate sample data with specified parameters
         
@@ -420,160 +654,771 @@ class SampleDataGenerator:
             row_count: Number of rows to generate
             products: List of products to include
             product_mapping: Product to category mapping
-            output_file: Output CSV file path
+            output_file: Output file path
             business_type: Type of business for pricing logic
-        """
+            chunk_size: Stream the output in chunks of this many rows, keeping
+                memory flat regardless of row_count (None builds one DataFrame)
+            workers: Split the rows into this many shards generated in a process
+                pool. Output is identical for a given seed and worker count.
+            output_format: 'csv', or 'parquet'/'feather' for typed columnar
+                output (datetime Date, dictionary-encoded text columns)
         
-        # Parse dates
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        For a given seed the rows depend only on workers and the chunk size
+        (DEFAULT_CHUNK_SIZE when chunk_size is None): building in memory gives
+        the same rows as streaming with one worker and the default chunk size.
+        At most MAX_RECORDS rows are built in memory.
         
-        if start_dt >= end_dt:
-            raise ValueError("Start date must be before end date")
+        Returns:
+            The generated rows (datetime Date, categorical text columns) when
+            built in memory; None when streamed with chunk_size or workers
+        """
+        
+        start_dt, end_dt = self._parse_range(start_date, end_date)
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive number")
+        if workers < 1:
+            raise ValueError("Workers must be at least 1")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}' (choose from {', '.join(OUTPUT_FORMATS)})")
+        streaming = chunk_size is not None or workers > 1
+        if not streaming and row_count > MAX_RECORDS:
+            raise ValueError(f"{row_count:,} rows is more than {MAX_RECORDS:,} to build in memory; "
+                             f"stream them with a chunk size or several workers")
         
         print(f"\n🔧 Generating {row_count:,} rows of data...")
         print(f"📅 Date range: {start_date} to {end_date}")
         print(f"📦 Products: {len(products)} products")
         print(f"🏷️ Business type: {business_type}")
         
-        # Generate data
-        data = []
+        if streaming:
+            self._generate_streaming(start_dt, end_dt, row_count, products, product_mapping,
+                                     output_file, business_type, chunk_size or DEFAULT_CHUNK_SIZE, workers,
+                                     output_format)
+            return None
         
-        for i in range(row_count):
-            # Generate random date in range
-            days_diff = (end_dt - start_dt).days
-            random_days = random.randint(0, days_diff)
-            record_date = start_dt + timedelta(days=random_days)
-            
-            # Select random location
-            state = random.choice(list(STATES_CITIES.keys()))
-            city = random.choice(STATES_CITIES[state])
-            
-            # Select random product
-            product = random.choice(products)
-            category = product_mapping.get(product, 'General')
-            
-            # Select random channel
-            channel = random.choice(CHANNELS)
-            
-            # Generate realistic budget and actuals based on business type
-            budget = self._generate_budget(product, category, state, channel, business_type)
-            actuals = self._generate_actuals(budget)
+        # Draw the same chunks as the default streaming path and join them into whole columns
+        encoding = _RowEncoding(start_dt, products, product_mapping)
+        day_ends = self._draw_day_ends(start_dt, end_dt, row_count)
+        chunks = list(self._iter_codes(encoding, day_ends, 0, row_count, business_type, DEFAULT_CHUNK_SIZE))
+        codes = chunks[0] if len(chunks) == 1 else {column: np.concatenate([chunk[column] for chunk in chunks])
+                                                    for column in chunks[0]}
+        print(f"📊 Progress: {row_count:,}/{row_count:,} (100.0%)")
+        
+        # Rows are already in date order; strings are only built by the CSV sink
+        with span('write'):
+            sink = _open_sink(output_file, output_format, encoding)
+            try:
+                sink.write(codes)
+            finally:
+                sink.close()
+        
+        # Generate summary from the codes; the frame is only built for the caller
+        with span('summary'):
+            summary = GenerationSummary(encoding)
+            summary.update(codes)
+            self._print_summary(summary, output_file, business_type)
+        return encoding.to_frame(codes)
+    
+    def iter_batches(self,
+                     start_date: str,
+                     end_date: str,
+                     row_count: int,
+                     products: List[str],
+                     product_mapping: Dict[str, str],
+                     business_type: str = "general",
+                     batch_size: int = DEFAULT_CHUNK_SIZE,
+                     batch_format: str = 'pandas',
+                     summary: Optional['GenerationSummary'] = None) -> Iterator:
+        """
+        Lazily yield generated rows in date order, without writing a file
+        
+        Rows are drawn as each batch is requested, so memory stays flat in
+        row_count. For a given seed the rows match generate_data with
+        chunk_size=batch_size and one worker.
+        
+        Args:
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            row_count: Number of rows to generate
+            products: List of products to include
+            product_mapping: Product to category mapping
+            business_type: Type of business for pricing logic
+            batch_size: Rows per batch
+            batch_format: 'pandas' for DataFrames (datetime Date, categorical
+                text columns) or 'arrow' for pyarrow RecordBatches with the
+                same schema as Parquet/Feather output
+            summary: Updated with every batch as it is yielded; create it with
+                GenerationSummary() and read it after the loop
             
-            # Create record
-            record = {
-                'Date': record_date.strftime('%Y-%m-%d'),
-                'Product': product,
-                'Category': category,
-                'State': state,
-                'City': city,
-                'Budget': budget,
-                'Actuals': actuals,
-                'Channel': channel
-            }
+        Yields:
+            One DataFrame or RecordBatch per batch_size rows
+        """
+        start_dt, end_dt = self._parse_range(start_date, end_date)
+        if batch_size <= 0:
+            raise ValueError("Batch size must be a positive number")
+        if batch_format not in ('pandas', 'arrow'):
+            raise ValueError(f"Unknown batch format '{batch_format}' (choose from pandas, arrow)")
+        
+        encoding = _RowEncoding(start_dt, products, product_mapping)
+        if batch_format == 'arrow':
+            schema = encoding.arrow_schema()
+        if summary is not None:
+            summary.start(encoding)
+        
+        day_ends = self._draw_day_ends(start_dt, end_dt, row_count)
+        for codes in self._iter_codes(encoding, day_ends, 0, row_count, business_type, batch_size):
+            if summary is not None:
+                summary.update(codes)
+            yield encoding.to_arrow(codes, schema) if batch_format == 'arrow' else encoding.to_frame(codes)
+    
+    def _parse_range(self, start_date: str, end_date: str) -> Tuple[datetime, datetime]:
+        """Parse and check a YYYY-MM-DD date range"""
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        
+        if start_dt >= end_dt:
+            raise ValueError("Start date must be before end date")
+        return start_dt, end_dt
+    
+    def _draw_day_ends(self, start_dt: datetime, end_dt: datetime, row_count: int) -> np.ndarray:
+        """
+        Draw how many rows fall on each day, as cumulative row counts
+        
+        The multinomial is the same distribution as drawing a uniform date per
+        row, so rows can then be produced day after day without ever sorting
+        the full dataset.
+        """
+        days_diff = (end_dt - start_dt).days
+        day_counts = self.rng.multinomial(row_count, np.full(days_diff + 1, 1.0 / (days_diff + 1)))
+        return np.cumsum(day_counts)
+    
+    def _generate_streaming(self,
+                            start_dt: datetime,
+                            end_dt: datetime,
+                            row_count: int,
+                            products: List[str],
+                            product_mapping: Dict[str, str],
+                            output_file: str,
+                            business_type: str,
+                            chunk_size: int,
+                            workers: int = 1,
+                            output_format: str = 'csv') -> None:
+        """
+        Generate and write rows chunk by chunk, in date order
+        
+        The number of rows on each day is drawn up front (see _draw_day_ends).
+        With several workers, each shard is a contiguous range of those rows
+        written to its own part file and concatenated in shard order; the
+        shards' summaries are merged.
+        """
+        day_ends = self._draw_day_ends(start_dt, end_dt, row_count)
+        
+        encoding = _RowEncoding(start_dt, products, product_mapping)
+        summary = GenerationSummary(encoding)
+        sink = _open_sink(output_file, output_format, encoding)
+        try:
+            if workers == 1:
+                self._write_rows(sink, encoding, day_ends, 0, row_count, business_type, chunk_size,
+                                 summary, report_progress=True)
+            else:
+                self._write_shards(sink, encoding, day_ends, row_count, business_type, chunk_size, workers,
+                                   output_file, output_format, summary)
+        finally:
+            sink.close()
+        
+        self._print_summary(summary, output_file, business_type)
+    
+    def _write_shards(self, sink, encoding: '_RowEncoding', day_ends: np.ndarray, row_count: int,
+                      business_type: str, chunk_size: int, workers: int, output_file: str,
+                      output_format: str, summary: 'GenerationSummary') -> None:
+        """Generate row shards in a process pool and append them to the sink in shard order"""
+        bounds = [row_count * i // workers for i in range(workers + 1)]
+        shard_seeds = self.seed_sequence.spawn(workers)
+        part_dir = tempfile.mkdtemp(prefix='.shards_', dir=os.path.dirname(os.path.abspath(output_file)))
+        
+        progress = ProgressReporter(row_count)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = []
+                for shard in range(workers):
+                    part_file = os.path.join(part_dir, f'part_{shard:05d}{OUTPUT_FORMATS[output_format]}')
+                    futures.append(pool.submit(_generate_shard, shard_seeds[shard], encoding, day_ends,
+                                               bounds[shard], bounds[shard + 1], business_type, chunk_size,
+                                               part_file, output_format))
+                
+                # Concatenate in shard order, whatever order the shards finish in
+                for shard, future in enumerate(futures):
+                    with span('wait_shard'):
+                        part_file, shard_summary = future.result()
+                    summary.merge(shard_summary)
+                    with span('append_part'):
+                        sink.append_part(part_file)
+                        os.remove(part_file)
+                    progress.update(bounds[shard + 1], f" - shard {shard + 1}/{workers}")
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
+    
+    def _write_rows(self, sink, encoding: '_RowEncoding', day_ends: np.ndarray, row_start: int, row_end: int,
+                    business_type: str, chunk_size: int, summary: 'GenerationSummary',
+                    report_progress: bool = False) -> None:
+        """Write rows [row_start, row_end) of the date-ordered sequence to the sink"""
+        progress = ProgressReporter(row_end - row_start) if report_progress else None
+        for codes in self._iter_codes(encoding, day_ends, row_start, row_end, business_type, chunk_size):
+            with span('write'):
+                sink.write(codes)
+            summary.update(codes)
             
-            data.append(record)
+            if progress:
+                progress.update(summary.rows)
+    
+    def _iter_codes(self, encoding: '_RowEncoding', day_ends: np.ndarray, row_start: int, row_end: int,
+                    business_type: str, chunk_size: int) -> Iterator[Dict[str, np.ndarray]]:
+        """Draw rows [row_start, row_end) of the date-ordered sequence, chunk_size rows at a time"""
+        for chunk_start in range(row_start, row_end, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, row_end)
+            with span('draw_columns'):
+                day_offsets = np.searchsorted(day_ends, np.arange(chunk_start, chunk_end), side='right')
+                codes = self._generate_columns(day_offsets, encoding, business_type)
+            yield codes
+    
+    def _generate_columns(self,
+                          day_offsets: np.ndarray,
+                          encoding: '_RowEncoding',
+                          business_type: str) -> Dict[str, np.ndarray]:
+        """
+        Draw every column for a block of rows as NumPy arrays of dictionary codes
+        
+        Each column follows the same distribution as drawing one row at a time:
+        uniform states, cities within the state, products and channels, then
+        budgets and actuals from the pricing tables above. Text columns are
+        int32 positions in encoding.dictionaries and Date is the day offset
+        from the start date; encoding turns them into strings or categoricals.
+        
+        Args:
+            day_offsets: Sorted day offset from the start date for every row
+            encoding: Dictionaries and lookup tables of the dataset
             
-            # Progress indicator
-            if (i + 1) % 100 == 0 or i == row_count - 1:
-                progress = ((i + 1) / row_count) * 100
-                print(f"📊 Progress: {i + 1:,}/{row_count:,} ({progress:.1f}%)")
-        
-        # Create DataFrame and save
-        df = pd.DataFrame(data)
-        
-        # Sort by date for better readability
-        df = df.sort_values('Date').reset_index(drop=True)
-        
-        # Save to CSV
-        df.to_csv(output_file, index=False)
-        
-        # Generate summary
-        self._print_summary(df, output_file, business_type)
-    
-    def _generate_budget(self, product: str, category: str, state: str, channel: str, business_type: str) -> int:
-        """Generate realistic budget based on product, location, and business type"""
-        
-        # Base budget ranges by business type
-        base_ranges = {
-            'restaurant': (5000, 50000),
-            'fitness': (10000, 80000),
-            'tech': (20000, 200000),
-            'fashion': (8000, 60000),
-            'automotive': (15000, 150000),
-            'beauty': (5000, 40000),
-            'home': (10000, 100000),
-            'general': (8000, 80000)
+        Returns:
+            Dict of column name to code (or amount) array, in the order of day_offsets
+        """
+        rng = self.rng
+        row_count = len(day_offsets)
+        
+        # Locations: uniform state, then uniform city within that state
+        state_idx = rng.integers(0, len(encoding.city_counts), size=row_count)
+        city_idx = encoding.city_starts[state_idx] + rng.integers(0, encoding.city_counts[state_idx])
+        
+        # Products (categories follow the product) and channels
+        product_idx = rng.integers(0, len(encoding.product_codes), size=row_count)
+        channel_idx = rng.integers(0, len(CHANNELS), size=row_count)
+        
+        budgets = self._generate_budgets(state_idx, channel_idx, business_type)
+        actuals = self._generate_actuals(budgets)
+        
+        return {
+            'Date': day_offsets.astype(np.int32),
+            'Product': encoding.product_codes[product_idx],
+            'Category': encoding.category_codes[product_idx],
+            'State': state_idx.astype(np.int32),
+            'City': encoding.city_codes[city_idx],
+            'Budget': budgets,
+            'Actuals': actuals,
+            'Channel': channel_idx.astype(np.int32)
         }
+    
+    def _generate_budgets(self, state_idx: np.ndarray, channel_idx: np.ndarray, business_type: str) -> np.ndarray:
+        """Generate realistic budgets based on location, channel, and business type"""
+        rng = self.rng
+        row_count = len(state_idx)
         
         # Determine business category
         business_key = 'general'
-        for key in base_ranges.keys():
+        for key in BUDGET_RANGES.keys():
             if key in business_type.lower():
                 business_key = key
                 break
         
         # Get base range
-        min_budget, max_budget = base_ranges[business_key]
-        base_budget = random.randint(min_budget, max_budget)
+        min_budget, max_budget = BUDGET_RANGES[business_key]
+        budgets = rng.integers(min_budget, max_budget + 1, size=row_count)
         
-        # Add location variance (coastal/major cities are more expensive)
-        major_states = ['California', 'New York', 'Texas', 'Florida', 'Illinois']
-        if state in major_states:
-            base_budget = int(base_budget * random.uniform(1.1, 1.4))
+        # Add location variance
+        is_major = IS_MAJOR_STATE[state_idx]
+        location_factor = rng.uniform(*MAJOR_STATE_MULTIPLIER, size=row_count)
+        budgets = np.where(is_major, (budgets * location_factor).astype(np.int64), budgets)
         
         # Add channel multiplier
-        channel_multipliers = {
-            'Online': random.uniform(0.8, 1.2),
-            'Retail': random.uniform(0.9, 1.1),
-            'Direct Sales': random.uniform(1.1, 1.4),
-            'Partner': random.uniform(0.7, 1.0),
-            'Wholesale': random.uniform(0.6, 0.9)
-        }
+        channel_factor = rng.uniform(CHANNEL_LOW[channel_idx], CHANNEL_HIGH[channel_idx])
         
-        return int(base_budget * channel_multipliers[channel])
+        return (budgets * channel_factor).astype(np.int64)
     
-    def _generate_actuals(self, budget: int) -> int:
+    def _generate_actuals(self, budgets: np.ndarray) -> np.ndarray:
         """Generate actuals with realistic variance"""
-        # Generate actuals with variance (-25% to +40% for more realistic business data)
-        variance_factor = random.uniform(0.75, 1.4)
-        return int(budget * variance_factor)
+        variance_factor = self.rng.uniform(*ACTUALS_VARIANCE, size=len(budgets))
+        return (budgets * variance_factor).astype(np.int64)
     
-    def _print_summary(self, df: pd.DataFrame, output_file: str, business_type: str) -> None:
+    def _print_summary(self, summary: 'GenerationSummary', output_file: str, business_type: str) -> None:
         """Print generation summary"""
         print(f"\n✅ Data generation complete!")
         print(f"📁 Output file: {output_file}")
         print(f"🏢 Business type: {business_type}")
-        print(f"📊 Total rows: {len(df):,}")
-        print(f"📅 Date range: {df['Date'].min()} to {df['Date'].max()}")
-        print(f"🏛️ States: {df['State'].nunique()}")
-        print(f"🏙️ Cities: {df['City'].nunique()}")
-        print(f"📦 Products: {df['Product'].nunique()}")
-        print(f"🏷️ Categories: {df['Category'].nunique()}")
-        print(f"📺 Channels: {df['Channel'].nunique()}")
-        print(f"💰 Budget range: ${df['Budget'].min():,} - ${df['Budget'].max():,}")
-        print(f"💸 Actuals range: ${df['Actuals'].min():,} - ${df['Actuals'].max():,}")
-        
-        # Calculate variance statistics
-        df['Variance'] = df['Actuals'] - df['Budget']
-        df['Variance_Pct'] = (df['Variance'] / df['Budget']) * 100
-        
-        print(f"📈 Variance range: {df['Variance_Pct'].min():.1f}% to {df['Variance_Pct'].max():.1f}%")
-        print(f"📊 Average variance: {df['Variance_Pct'].mean():.1f}%")
+        print(f"📊 Total rows: {summary.rows:,}")
+        if not summary.rows:
+            return
+        first_date, last_date = summary.date_range
+        print(f"📅 Date range: {first_date:%Y-%m-%d} to {last_date:%Y-%m-%d}")
+        print(f"🏛️ States: {summary.distinct('State')}")
+        print(f"🏙️ Cities: {summary.distinct('City')}")
+        print(f"📦 Products: {summary.distinct('Product')}")
+        print(f"🏷️ Categories: {summary.distinct('Category')}")
+        print(f"📺 Channels: {summary.distinct('Channel')}")
+        print(f"💰 Budget range: ${summary.budget_range[0]:,} - ${summary.budget_range[1]:,}")
+        print(f"💸 Actuals range: ${summary.actuals_range[0]:,} - ${summary.actuals_range[1]:,}")
+        print(f"📈 Variance range: {summary.variance_pct_range[0]:.1f}% to {summary.variance_pct_range[1]:.1f}%")
+        print(f"📊 Average variance: {summary.variance_pct_mean:.1f}%")
         
         # Show sample data
         print(f"\n📄 Sample data preview:")
-        sample_df = df[['Date', 'Product', 'Category', 'State', 'Budget', 'Actuals', 'Channel']].head(3)
-        print(sample_df.to_string(index=False))
+        print(summary.sample.to_string(index=False))
         
         # Category breakdown
         print(f"\n📦 Category breakdown:")
-        category_summary = df.groupby('Category').agg({
-            'Budget': ['count', 'sum'],
-            'Actuals': 'sum'
-        }).round(0)
-        category_summary.columns = ['Records', 'Budget_Total', 'Actuals_Total']
-        print(category_summary.to_string())
+        print(summary.category_breakdown().to_string())
+
+class GenerationSummary:
+    """
+    Summary statistics of generated rows, updated one batch at a time
+    
+    Counts, ranges and per-category totals are folded in from the code
+    arrays of each batch, so the summary never re-scans the generated data.
+    Summaries of disjoint row ranges (e.g. worker shards) can be merged.
+    """
+    
+    # Rows kept for the sample data preview
+    SAMPLE_ROWS = 3
+    
+    def __init__(self, encoding: Optional['_RowEncoding'] = None):
+        self.encoding = None
+        self.rows = 0
+        if encoding is not None:
+            self.start(encoding)
+    
+    def start(self, encoding: '_RowEncoding') -> None:
+        """Reset the summary for a dataset coded against encoding"""
+        self.encoding = encoding
+        self.rows = 0
+        self.first_day = None
+        self.last_day = None
+        self.seen = {column: np.zeros(len(values), dtype=bool) for column, values in encoding.dictionaries.items()}
+        self.budget_range = (None, None)
+        self.actuals_range = (None, None)
+        self.variance_pct_range = (None, None)
+        self.variance_pct_sum = 0.0
+        n_categories = len(encoding.dictionaries['Category'])
+        self.category_rows = np.zeros(n_categories, dtype=np.int64)
+        self.category_budget = np.zeros(n_categories, dtype=np.int64)
+        self.category_actuals = np.zeros(n_categories, dtype=np.int64)
+        self.sample = None
+    
+    def update(self, codes: Dict[str, np.ndarray]) -> None:
+        """Fold in one batch of coded rows"""
+        if not len(codes['Date']):
+            return
+        budgets, actuals = codes['Budget'], codes['Actuals']
+        variance_pct = (actuals - budgets) / budgets * 100
+        
+        batch = GenerationSummary()
+        batch.start(self.encoding)
+        batch.rows = len(budgets)
+        batch.first_day, batch.last_day = int(codes['Date'].min()), int(codes['Date'].max())
+        for column, seen in batch.seen.items():
+            seen |= np.bincount(codes[column], minlength=len(seen)) > 0
+        batch.budget_range = (budgets.min(), budgets.max())
+        batch.actuals_range = (actuals.min(), actuals.max())
+        batch.variance_pct_range = (variance_pct.min(), variance_pct.max())
+        batch.variance_pct_sum = float(variance_pct.sum())
+        
+        category = codes['Category']
+        n_categories = len(batch.category_rows)
+        batch.category_rows = np.bincount(category, minlength=n_categories)
+        batch.category_budget = _int_bincount(category, budgets, n_categories)
+        batch.category_actuals = _int_bincount(category, actuals, n_categories)
+        
+        head = {column: values[:self.SAMPLE_ROWS] for column, values in codes.items()}
+        batch.sample = self.encoding.to_frame(head)[['Date', 'Product', 'Category', 'State', 'Budget',
+                                                      'Actuals', 'Channel']]
+        self.merge(batch)
+    
+    def merge(self, other: 'GenerationSummary') -> None:
+        """Fold in the summary of rows that come after the rows seen so far"""
+        if not other.rows:
+            return
+        if not self.rows:
+            self.__dict__.update({key: value for key, value in other.__dict__.items() if key != 'encoding'})
+            return
+        
+        def widen(ours: Tuple, theirs: Tuple) -> Tuple:
+            return (min(ours[0], theirs[0]), max(ours[1], theirs[1]))
+        
+        self.rows += other.rows
+        self.first_day = min(self.first_day, other.first_day)
+        self.last_day = max(self.last_day, other.last_day)
+        for column, seen in self.seen.items():
+            seen |= other.seen[column]
+        self.budget_range = widen(self.budget_range, other.budget_range)
+        self.actuals_range = widen(self.actuals_range, other.actuals_range)
+        self.variance_pct_range = widen(self.variance_pct_range, other.variance_pct_range)
+        self.variance_pct_sum += other.variance_pct_sum
+        self.category_rows += other.category_rows
+        self.category_budget += other.category_budget
+        self.category_actuals += other.category_actuals
+    
+    @property
+    def date_range(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """First and last generated date"""
+        return (pd.Timestamp(self.encoding.start_day + self.first_day),
+                pd.Timestamp(self.encoding.start_day + self.last_day))
+    
+    @property
+    def variance_pct_mean(self) -> float:
+        """Average per-row variance in percent of budget"""
+        return self.variance_pct_sum / self.rows
+    
+    def distinct(self, column: str) -> int:
+        """Number of distinct values generated for a text column"""
+        return int(self.seen[column].sum())
+    
+    def category_breakdown(self) -> pd.DataFrame:
+        """Records, budget and actuals totals per generated category, by category name"""
+        present = self.category_rows > 0
+        breakdown = pd.DataFrame({
+            'Records': self.category_rows[present],
+            'Budget_Total': self.category_budget[present],
+            'Actuals_Total': self.category_actuals[present]
+        }, index=pd.Index(np.array(self.encoding.dictionaries['Category'], dtype=object)[present], name='Category'))
+        return breakdown.sort_index()
+
+def _int_bincount(codes: np.ndarray, values: np.ndarray, length: int) -> np.ndarray:
+    """Integer sums of values per code (float64 accumulation is exact below 2**53)"""
+    return np.bincount(codes, weights=values, minlength=length).round().astype(np.int64)
+
+class _RowEncoding:
+    """
+    Dictionaries that generated rows are coded against, shared by all chunks of a dataset
+    
+    Text columns are kept as int32 positions in these dictionaries and dates
+    as day offsets from the start date, so a row costs a few dozen bytes
+    until a sink (or to_frame) materializes it.
+    """
+    
+    def __init__(self, start_dt: datetime, products: List[str], product_mapping: Dict[str, str]):
+        self.start_day = np.datetime64(start_dt.date(), 'D')
+        self.dictionaries = {
+            'Product': list(dict.fromkeys(products)),
+            'Category': list(dict.fromkeys(product_mapping.get(p, 'General') for p in products)),
+            'State': list(STATES_CITIES.keys()),
+            'City': list(dict.fromkeys(city for cities in STATES_CITIES.values() for city in cities)),
+            'Channel': list(CHANNELS)
+        }
+        
+        # Drawn positions (in products / the flattened city lists) to dictionary codes;
+        # duplicate products and cities shared by two states map to one code
+        product_codes = {p: i for i, p in enumerate(self.dictionaries['Product'])}
+        category_codes = {c: i for i, c in enumerate(self.dictionaries['Category'])}
+        city_codes = {c: i for i, c in enumerate(self.dictionaries['City'])}
+        self.product_codes = np.array([product_codes[p] for p in products], dtype=np.int32)
+        self.category_codes = np.array([category_codes[product_mapping.get(p, 'General')] for p in products],
+                                       dtype=np.int32)
+        self.city_codes = np.array([city_codes[city] for cities in STATES_CITIES.values() for city in cities],
+                                   dtype=np.int32)
+        self.city_counts = np.array([len(cities) for cities in STATES_CITIES.values()])
+        self.city_starts = np.concatenate(([0], np.cumsum(self.city_counts)[:-1]))
+        self._arrow_dictionaries = None
+    
+    def dates(self, day_offsets: np.ndarray) -> np.ndarray:
+        """Day offsets as datetime64[s] dates"""
+        return (self.start_day + day_offsets).astype('datetime64[s]')
+    
+    def to_strings(self, codes: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Materialize coded columns as strings ('YYYY-MM-DD' dates), for text output"""
+        day_offsets = codes['Date']
+        first_day = int(day_offsets[0]) if len(day_offsets) else 0
+        last_day = int(day_offsets[-1]) if len(day_offsets) else 0
+        
+        # Format only the days this block covers, then look them up
+        date_strings = np.datetime_as_string(self.start_day + np.arange(first_day, last_day + 1), unit='D')
+        columns = {'Date': date_strings[day_offsets - first_day]}
+        for column in OUTPUT_COLUMNS[1:]:
+            if column in self.dictionaries:
+                columns[column] = np.array(self.dictionaries[column], dtype=object)[codes[column]]
+            else:
+                columns[column] = codes[column]
+        return columns
+    
+    def arrow_schema(self):
+        """Arrow schema of generated rows: timestamp Date, dictionary-encoded text, int64 amounts"""
+        pa = _import_pyarrow()
+        return pa.schema([
+            (column, pa.dictionary(pa.int32(), pa.string()) if column in self.dictionaries
+             else pa.timestamp('ms') if column == 'Date' else pa.int64())
+            for column in OUTPUT_COLUMNS
+        ])
+    
+    def to_arrow(self, codes: Dict[str, np.ndarray], schema=None):
+        """Coded columns as an Arrow RecordBatch; codes become dictionary indices as they are"""
+        pa = _import_pyarrow()
+        if self._arrow_dictionaries is None:
+            self._arrow_dictionaries = {column: pa.array(values, type=pa.string())
+                                        for column, values in self.dictionaries.items()}
+        arrays = []
+        for column in OUTPUT_COLUMNS:
+            if column in self.dictionaries:
+                arrays.append(pa.DictionaryArray.from_arrays(codes[column], self._arrow_dictionaries[column]))
+            elif column == 'Date':
+                arrays.append(pa.array(self.dates(codes['Date']).astype('datetime64[ms]')))
+            else:
+                arrays.append(pa.array(codes[column], type=pa.int64()))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema or self.arrow_schema())
+    
+    def __getstate__(self) -> Dict:
+        # Arrow dictionaries are rebuilt lazily in worker processes
+        return dict(self.__dict__, _arrow_dictionaries=None)
+    
+    def to_frame(self, codes: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Coded columns as a DataFrame with datetime Date and categorical text columns"""
+        columns = {'Date': self.dates(codes['Date'])}
+        for column in OUTPUT_COLUMNS[1:]:
+            if column in self.dictionaries:
+                columns[column] = pd.Categorical.from_codes(codes[column], categories=self.dictionaries[column])
+            else:
+                columns[column] = codes[column]
+        return pd.DataFrame(columns)
+
+class _CsvSink:
+    """Append generated chunks to a CSV file"""
+    
+    def __init__(self, path: str, encoding: _RowEncoding, header: bool = True):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.encoding = encoding
+        if header:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(self.file, index=False)
+    
+    def write(self, codes: Dict[str, np.ndarray]) -> None:
+        pd.DataFrame(self.encoding.to_strings(codes)).to_csv(self.file, index=False, header=False)
+    
+    def append_part(self, part_file: str) -> None:
+        with open(part_file, 'r', newline='', encoding='utf-8') as part:
+            shutil.copyfileobj(part, self.file)
+    
+    def close(self) -> None:
+        self.file.close()
+
+class _ArrowSink:
+    """Append generated chunks to a Parquet file (one row group per chunk) or a Feather v2 file"""
+    
+    def __init__(self, path: str, output_format: str, encoding: _RowEncoding):
+        try:
+            pa = _import_pyarrow()
+            import pyarrow.parquet as pq
+        except ValueError:
+            raise ValueError(f"--format {output_format} requires pyarrow (pip install pyarrow)")
+        
+        self.pa = pa
+        self.pq = pq
+        self.output_format = output_format
+        self.encoding = encoding
+        self.schema = encoding.arrow_schema()
+        if output_format == 'parquet':
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            # Uncompressed Arrow IPC so readers can memory-map the file
+            self.writer = pa.ipc.new_file(path, self.schema)
+    
+    def write(self, codes: Dict[str, np.ndarray]) -> None:
+        batch = self.encoding.to_arrow(codes, self.schema)
+        self.writer.write_table(self.pa.Table.from_batches([batch], schema=self.schema))
+    
+    def append_part(self, part_file: str) -> None:
+        if self.output_format == 'parquet':
+            part = self.pq.ParquetFile(part_file)
+            for i in range(part.num_row_groups):
+                self.writer.write_table(part.read_row_group(i))
+            part.close()
+        else:
+            with self.pa.memory_map(part_file) as source:
+                reader = self.pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    self.writer.write_batch(reader.get_batch(i))
+    
+    def close(self) -> None:
+        self.writer.close()
+
+def _import_pyarrow():
+    """Import pyarrow, which only the columnar outputs need"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Arrow output requires pyarrow (pip install pyarrow)")
+    return pa
+
+def _open_sink(path: str, output_format: str, encoding: _RowEncoding, header: bool = True):
+    """Open the writer for an output format ('csv', 'parquet' or 'feather')"""
+    if output_format == 'csv':
+        return _CsvSink(path, encoding, header=header)
+    return _ArrowSink(path, output_format, encoding)
+
+def _generate_shard(seed_sequence: np.random.SeedSequence, encoding: _RowEncoding, day_ends: np.ndarray,
+                    row_start: int, row_end: int, business_type: str, chunk_size: int, part_file: str,
+                    output_format: str = 'csv') -> Tuple[str, GenerationSummary]:
+    """Process pool entry point: write one shard of rows to part_file with its own RNG stream"""
+    generator = SampleDataGenerator(seed=seed_sequence)
+    summary = GenerationSummary(encoding)
+    sink = _open_sink(part_file, output_format, encoding, header=False)
+    try:
+        generator._write_rows(sink, encoding, day_ends, row_start, row_end, business_type, chunk_size, summary)
+    finally:
+        sink.close()
+    return part_file, summary
+
+# Keys a manifest dataset spec may set (business and records are required)
+MANIFEST_KEYS = {'business', 'records', 'months', 'start_date', 'end_date', 'output', 'format', 'chunk_size', 'seed'}
+
+def load_manifest(manifest_path: str, today: Optional[datetime] = None) -> List[Dict]:
+    """
+    Read and check a JSON manifest of datasets to generate
+    
+    The manifest is either a list of dataset specs or an object with a
+    "datasets" list and optional "defaults" merged into every spec. A spec
+    names a business and a record count, plus either months (ending today)
+    or start_date/end_date, and optionally output, format, chunk_size and
+    seed. Output defaults to the same name as the command line would use,
+    and format to the output file's extension. Specs with more than
+    MAX_RECORDS records and no chunk_size stream in DEFAULT_CHUNK_SIZE chunks.
+    
+    Args:
+        manifest_path: Path to the JSON manifest
+        today: End date for specs given in months (default: now)
+        
+    Returns:
+        List of resolved specs with business, records, start_date, end_date,
+        output, format, chunk_size and seed keys
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    defaults = {}
+    if isinstance(manifest, dict):
+        defaults = manifest.get('defaults', {})
+        manifest = manifest.get('datasets')
+    if not isinstance(manifest, list) or not manifest:
+        raise ValueError(f"Manifest {manifest_path} lists no datasets")
+    
+    today = today or datetime.now()
+    specs = []
+    for number, entry in enumerate(manifest, 1):
+        spec = dict(defaults, **entry) if isinstance(entry, dict) else None
+        if spec is None or not spec.get('business') or not isinstance(spec.get('records'), int) or spec['records'] < 1:
+            raise ValueError(f"Manifest dataset {number} needs a business and a positive integer records count")
+        unknown = set(spec) - MANIFEST_KEYS
+        if unknown:
+            raise ValueError(f"Manifest dataset {number} has unknown keys: {', '.join(sorted(unknown))}")
+        
+        if 'start_date' in spec or 'end_date' in spec:
+            start_date, end_date = spec.get('start_date'), spec.get('end_date')
+            if not start_date or not end_date:
+                raise ValueError(f"Manifest dataset {number} needs both start_date and end_date")
+            months = None
+        else:
+            months = spec.get('months', 12)
+            start_date = (today - timedelta(days=months * 30)).strftime('%Y-%m-%d')
+            end_date = today.strftime('%Y-%m-%d')
+        
+        output_format = spec.get('format')
+        if output_format is None:
+            suffix = Path(spec['output']).suffix.lower() if spec.get('output') else '.csv'
+            output_format = next((name for name, ext in OUTPUT_FORMATS.items() if ext == suffix), 'csv')
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Manifest dataset {number} has unknown format '{output_format}'")
+        output = spec.get('output')
+        if not output:
+            span_label = f"{months}months" if months is not None else f"{start_date}_to_{end_date}"
+            output = f"sample_data_{spec['business'].replace(' ', '_')}_{span_label}{OUTPUT_FORMATS[output_format]}"
+        
+        chunk_size = spec.get('chunk_size')
+        if chunk_size is None and spec['records'] > MAX_RECORDS:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        
+        specs.append({'business': spec['business'], 'records': spec['records'], 'start_date': start_date,
+                      'end_date': end_date, 'output': output, 'format': output_format,
+                      'chunk_size': chunk_size, 'seed': spec.get('seed')})
+    
+    outputs = [spec['output'] for spec in specs]
+    duplicates = sorted({output for output in outputs if outputs.count(output) > 1})
+    if duplicates:
+        raise ValueError(f"Manifest writes more than one dataset to: {', '.join(duplicates)}")
+    return specs
+
+def _generate_manifest_dataset(spec: Dict, catalog: Tuple[List[str], List[str], Dict[str, str]],
+                               seed) -> Tuple[int, Optional[str]]:
+    """Process pool entry point: generate one manifest dataset quietly, returning the error text instead of raising"""
+    products, _, product_mapping = catalog
+    try:
+        generator = SampleDataGenerator(seed=seed)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            generator.generate_data(spec['start_date'], spec['end_date'], spec['records'], products,
+                                    product_mapping, spec['output'], business_type=spec['business'],
+                                    chunk_size=spec['chunk_size'], output_format=spec['format'])
+        return spec['records'], None
+    except Exception as e:
+        return 0, f"{type(e).__name__}: {e}"
+
+def generate_datasets(specs: List[Dict],
+                      workers: Optional[int] = None,
+                      seed: int = 42,
+                      ai_generator: Optional[AIProductGenerator] = None) -> Dict[str, str]:
+    """
+    Generate many datasets in one process pool, sharing their catalogs
+    
+    Catalogs are generated once per distinct business type in this process
+    (concurrently and through the cache when an LLM is configured) and sent
+    to the workers, which keep the module's lookup tables for every dataset
+    they generate. Datasets are scheduled largest first. A dataset that
+    fails does not stop the others.
+    
+    Args:
+        specs: Resolved dataset specs, as from load_manifest
+        workers: Worker processes (default: the CPU count, capped at the number of datasets)
+        seed: Master seed; datasets without their own seed get independent
+            streams spawned from it by manifest position
+        ai_generator: Catalog generator (default: keyword-based, no LLM)
+        
+    Returns:
+        Dict of output file to error text for the datasets that failed
+    """
+    ai_generator = ai_generator or AIProductGenerator()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(specs)))
+    with span('catalogs'):
+        catalogs = ai_generator.generate_catalogs(list(dict.fromkeys(spec['business'] for spec in specs)))
+    seeds = np.random.SeedSequence(seed).spawn(len(specs))
+    
+    print(f"\n🗂️ Generating {len(specs)} datasets ({sum(spec['records'] for spec in specs):,} rows, "
+          f"{len({normalize_business_type(b) for b in catalogs})} catalogs) with {workers} workers...")
+    failures = {}
+    with span('generate_datasets'), ProcessPoolExecutor(max_workers=workers) as pool:
+        order = sorted(range(len(specs)), key=lambda i: -specs[i]['records'])
+        futures = {pool.submit(_generate_manifest_dataset, specs[i], catalogs[specs[i]['business']],
+                               specs[i]['seed'] if specs[i]['seed'] is not None else seeds[i]): specs[i]
+                   for i in order}
+        for done, future in enumerate(as_completed(futures), 1):
+            spec = futures[future]
+            try:
+                rows, error = future.result()
+            except Exception as e:  # the worker process itself died
+                rows, error = 0, f"{type(e).__name__}: {e}"
+            if error:
+                failures[spec['output']] = error
+            status = f"❌ {error}" if error else f"✅ {rows:,} rows ({spec['business']})"
+            print(f"[{done}/{len(specs)}] {spec['output']}: {status}")
+    return failures
 
 def main():
     """Main command line interface"""
@@ -590,6 +1435,25 @@ Examples:
   
   # Custom parameters
   python generate_sample_data.py --business "restaurant chain" --months 12 --records 1000 --output restaurant_data.csv
+  
+  # Large load-test file streamed in 1M-row chunks
+  python generate_sample_data.py --business "tech startup" --months 24 --records 100000000 --chunk-size 1000000
+  
+  # Same file generated by 8 parallel shards
+  python generate_sample_data.py --business "tech startup" --months 24 --records 100000000 --workers 8
+  
+  # Typed columnar output for fast, parse-free loading
+  python generate_sample_data.py --business "tech startup" --months 12 --records 10000000 --format parquet
+  
+  # Every dataset listed in a manifest, 4 at a time
+  python generate_sample_data.py --manifest corpus.json --workers 4
+  
+  # corpus.json:
+  {"defaults": {"months": 6},
+   "datasets": [{"business": "tech startup", "records": 12000, "output": "12k.csv"},
+                {"business": "home furniture store", "records": 5000, "output": "buildstuff.parquet"}]}
+  # Spec keys: business, records, months or start_date/end_date, output, format, chunk_size, seed;
+  # datasets of more than 10,000,000 records stream in 500,000-row chunks unless chunk_size is set
         """
     )
     
@@ -606,10 +1470,59 @@ Examples:
     
     parser.add_argument('--records', '-r',
                        type=int,
-                       help='Number of records to generate (50-10000)')
+                       help=f'Number of records to generate (more than {MAX_RECORDS:,} needs --chunk-size or --workers)')
     
     parser.add_argument('--output', '-o',
-                       help='Output CSV file name')
+                       help='Output file name')
+    
+    parser.add_argument('--format', '-f',
+                       dest='output_format',
+                       choices=list(OUTPUT_FORMATS),
+                       default='csv',
+                       help='Output format: csv (default), or parquet/feather with typed, dictionary-encoded columns')
+    
+    parser.add_argument('--chunk-size',
+                       type=int,
+                       help='Stream output in chunks of N rows with flat memory (for very large files)')
+    
+    parser.add_argument('--workers', '-w',
+                       type=int,
+                       help='Generate in N parallel shards (output is identical for a given seed and N); '
+                            'with --manifest, generate N datasets at a time (default: CPU count)')
+    
+    parser.add_argument('--manifest',
+                       metavar='PATH',
+                       help='Generate every dataset listed in a JSON manifest in one run (see examples)')
+    
+    parser.add_argument('--seed',
+                       type=int,
+                       default=42,
+                       help='Master random seed (default: 42)')
+    
+    parser.add_argument('--llm-url',
+                       nargs='?',
+                       const=DEFAULT_LLM_URL,
+                       metavar='URL',
+                       help=f'Ask an Ollama-compatible endpoint for the product catalog (default URL: {DEFAULT_LLM_URL})')
+    
+    parser.add_argument('--llm-model',
+                       default=DEFAULT_LLM_MODEL,
+                       help=f'Model for --llm-url (default: {DEFAULT_LLM_MODEL})')
+    
+    parser.add_argument('--catalog-cache-dir',
+                       default=DEFAULT_CATALOG_CACHE_DIR,
+                       help=f'Directory caching AI catalogs by business type (default: {DEFAULT_CATALOG_CACHE_DIR})')
+    
+    parser.add_argument('--catalog-ttl-hours',
+                       type=float,
+                       default=DEFAULT_CATALOG_TTL_HOURS,
+                       help=f'Re-ask the LLM for catalogs older than this; 0 disables the cache (default: {DEFAULT_CATALOG_TTL_HOURS})')
+    
+    parser.add_argument('--profile',
+                       nargs='?',
+                       const='-',
+                       metavar='PATH',
+                       help='Record per-stage wall/CPU time and peak RSS; print the report, or write it to PATH (*.json for a Chrome trace)')
     
     parser.add_argument('--list-examples',
                        action='store_true',
@@ -636,26 +1549,44 @@ Examples:
             print(f"  {i:2d}. {example}")
         return
     
+    if args.profile:
+        profiling.enable()
+    
     try:
-        generator = SampleDataGenerator()
+        cache = CatalogCache(args.catalog_cache_dir, args.catalog_ttl_hours) \
+            if args.llm_url and args.catalog_ttl_hours > 0 else None
+        ai_generator = AIProductGenerator(llm_url=args.llm_url, model=args.llm_model, cache=cache)
+        generator = SampleDataGenerator(seed=args.seed, ai_generator=ai_generator)
+        
+        if args.manifest:
+            specs = load_manifest(args.manifest)
+            failures = generate_datasets(specs, workers=args.workers, seed=args.seed, ai_generator=ai_generator)
+            if args.profile:
+                profiling.get_profiler().dump(args.profile)
+            if failures:
+                print(f"❌ {len(failures)} of {len(specs)} datasets failed")
+                sys.exit(1)
+            print(f"\n✅ Generated {len(specs)} datasets")
+            return
         
         if args.interactive or not all([args.business, args.months, args.records]):
             # Interactive mode
             config = generator.interactive_setup()
             
-            generator.generate_data(
-                start_date=config['start_date'],
-                end_date=config['end_date'],
-                row_count=config['records'],
-                products=config['products'],
-                product_mapping=config['product_mapping'],
-                output_file=config['output_file'],
-                business_type=config['business_type']
-            )
+            with span('generate_data'):
+                generator.generate_data(
+                    start_date=config['start_date'],
+                    end_date=config['end_date'],
+                    row_count=config['records'],
+                    products=config['products'],
+                    product_mapping=config['product_mapping'],
+                    output_file=config['output_file'],
+                    business_type=config['business_type']
+                )
         else:
             # Command line mode
             if not args.output:
-                args.output = f"sample_data_{args.business.replace(' ', '_')}_{args.months}months.csv"
+                args.output = f"sample_data_{args.business.replace(' ', '_')}_{args.months}months{OUTPUT_FORMATS[args.output_format]}"
             
             # Calculate date range
             end_date = datetime.now()
@@ -664,15 +1595,22 @@ Examples:
             # Generate products for the business type
             products, categories, product_mapping = generator.ai_generator.generate_products_and_categories(args.business)
             
-            generator.generate_data(
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=end_date.strftime('%Y-%m-%d'),
-                row_count=args.records,
-                products=products,
-                product_mapping=product_mapping,
-                output_file=args.output,
-                business_type=args.business
-            )
+            with span('generate_data'):
+                generator.generate_data(
+                    start_date=start_date.strftime('%Y-%m-%d'),
+                    end_date=end_date.strftime('%Y-%m-%d'),
+                    row_count=args.records,
+                    products=products,
+                    product_mapping=product_mapping,
+                    output_file=args.output,
+                    business_type=args.business,
+                    chunk_size=args.chunk_size,
+                    workers=args.workers or 1,
+                    output_format=args.output_format
+                )
+        
+        if args.profile:
+            profiling.get_profiler().dump(args.profile)
         
     except ValueError as e:
         print(f"❌ Error: {e}")
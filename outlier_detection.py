@@ -0,0 +1,347 @@
+"""
+Streaming outlier detection over chunked sales data.
+
+The first pass folds each chunk into per-group running statistics: count,
+mean and M2, merged with Chan's parallel form of Welford's update, plus
+min/max. It also feeds a log-bucketed quantile sketch in the style of
+DDSketch (every quantile within a fixed relative error). The second pass
+flags rows whose z-score or IQR fences, computed from those statistics,
+mark them as outliers. Memory depends on the number of groups and sketch
+buckets, not on the number of rows.
+"""
+
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analyze_reg import DEFAULT_CHUNK_ROWS, iter_sales_chunks, load_sales_data, measure_columns, measure_values
+from profiling import span
+from rollup_cube import GRAINS, period_keys
+
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_IQR_MULTIPLIER = 1.5
+
+# Groups with fewer rows are summarized but never flagged
+DEFAULT_MIN_GROUP_ROWS = 5
+
+# Relative error of sketched quantiles
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Magnitudes below this are counted in the sketch's zero bucket
+_SKETCH_MIN_MAGNITUDE = 1e-9
+
+
+class QuantileSketch:
+    """
+    Mergeable per-group quantile sketch with bounded relative error.
+
+    Values are counted in logarithmic buckets of ratio gamma = (1 + a) / (1 - a)
+    per sign, so any estimated quantile is within a relative accuracy a of a
+    value of the data. The number of buckets grows with the logarithm of the
+    value range, not with the number of values.
+
+    Args:
+        relative_accuracy (float): Relative error a of estimated quantiles.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.counts = None
+
+    def update(self, values, keys):
+        """
+        Adds values to the sketches of their groups.
+
+        Args:
+            values (pd.Series): Measure values; NaN and infinite values are skipped.
+            keys (list): Group key series aligned with values.
+        """
+        finite = np.isfinite(values.to_numpy(dtype='float64'))
+        if not finite.all():
+            values, keys = values[finite], [key[finite] for key in keys]
+        magnitude = np.abs(values.to_numpy(dtype='float64'))
+        sign = np.where(magnitude < _SKETCH_MIN_MAGNITUDE, 0, np.sign(values.to_numpy(dtype='float64'))).astype(np.int8)
+        with np.errstate(divide='ignore'):
+            bucket = np.where(sign == 0, 0, np.ceil(np.log(magnitude) / math.log(self.gamma))).astype(np.int32)
+        bucket_keys = keys + [pd.Series(sign, index=values.index, name='_sign'),
+                              pd.Series(bucket, index=values.index, name='_bucket')]
+        counts = values.groupby(bucket_keys, observed=True).size()
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0).astype('int64')
+
+    def quantiles(self, qs):
+        """
+        Estimates quantiles for every group.
+
+        Args:
+            qs (list): Quantiles in [0, 1].
+
+        Returns:
+            pd.DataFrame: One row per group, one column per quantile.
+        """
+        counts = self.counts.reset_index(name='_count')
+        group_columns = [c for c in counts.columns if c not in ('_sign', '_bucket', '_count')]
+        representative = 2 * np.power(self.gamma, counts['_bucket'].to_numpy(dtype='float64')) / (self.gamma + 1)
+        counts['_value'] = counts['_sign'].to_numpy() * np.where(counts['_sign'] == 0, 0.0, representative)
+        counts = counts.sort_values(group_columns + ['_value'], kind='stable')
+
+        grouped = counts.groupby(group_columns, sort=False)
+        cumulative = grouped['_count'].cumsum()
+        totals = grouped['_count'].transform('sum')
+        result = {}
+        for q in qs:
+            # First bucket holding the value of rank q * (n - 1)
+            reached = counts[cumulative.to_numpy() > q * (totals.to_numpy() - 1)]
+            result[q] = reached.groupby(group_columns, sort=False)['_value'].first()
+        return pd.DataFrame(result)
+
+
+class OutlierDetector:
+    """
+    Two-pass, bounded-memory outlier detector.
+
+    Call fit_chunk on every chunk, then flag_chunk on every chunk again.
+
+    Args:
+        measure (str): Column to scan, or a key of DERIVED_MEASURES.
+        by (list): Dimensions defining the groups, e.g. ['Product'] or ['Region'].
+        grain (str): Also group by period: 'Month', 'Quarter', 'Year', or 'All' for no period.
+        z_threshold (float): |z| above which a row is a z-score outlier.
+        iqr_multiplier (float): Fence distance beyond Q1/Q3 in interquartile ranges.
+        relative_accuracy (float): Relative error of the sketched quartiles;
+            IQR fences are widened by this much so sketch error alone never
+            flags a row.
+        min_group_rows (int): Groups with fewer rows are never flagged.
+    """
+
+    def __init__(self, measure='Actuals', by=('Product',), grain='All', z_threshold=DEFAULT_Z_THRESHOLD,
+                 iqr_multiplier=DEFAULT_IQR_MULTIPLIER, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 min_group_rows=DEFAULT_MIN_GROUP_ROWS):
+        if grain not in GRAINS:
+            raise ValueError(f"Unknown grain: {grain}")
+        self.measure = measure
+        self.by = list(by)
+        self.grain = grain
+        self.z_threshold = z_threshold
+        self.iqr_multiplier = iqr_multiplier
+        self.min_group_rows = min_group_rows
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.stats = None
+        self._thresholds = None
+
+    @property
+    def group_columns(self):
+        """Columns identifying a group: the grain's period columns, then by."""
+        return GRAINS[self.grain] + self.by
+
+    def _keys(self, chunk):
+        return period_keys(chunk['Date'], self.grain) + [chunk[dimension] for dimension in self.by]
+
+    def fit_chunk(self, chunk):
+        """
+        Folds a chunk into the running statistics and sketches.
+
+        Args:
+            chunk (pd.DataFrame): Rows with Date, the by dimensions and the measure's columns.
+        """
+        with span('fit'):
+            chunk = chunk[chunk['Date'].notna()]
+            values = measure_values(chunk, self.measure)
+            # Missing measures are neither counted nor sketched
+            finite = np.isfinite(values.to_numpy(dtype='float64'))
+            chunk, values = chunk[finite], values[finite]
+            keys = self._keys(chunk)
+            if not keys:
+                keys = [pd.Series(0, index=chunk.index, name='_all')]
+
+            grouped = values.groupby(keys, observed=True)
+            part = pd.DataFrame({'count': grouped.count(), 'mean': grouped.mean(), 'min': grouped.min(),
+                                 'max': grouped.max()})
+            part['m2'] = grouped.var(ddof=0).fillna(0) * part['count']
+            self.stats = part if self.stats is None else self._merge(self.stats, part)
+            self.sketch.update(values, keys)
+            self._thresholds = None
+
+    @staticmethod
+    def _merge(left, right):
+        """Combines two sets of per-group moments (Chan et al.)."""
+        left, right = left.align(right, join='outer')
+        n_a, n_b = left['count'].fillna(0), right['count'].fillna(0)
+        mean_a, mean_b = left['mean'].fillna(0), right['mean'].fillna(0)
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        return pd.DataFrame({
+            'count': n,
+            'mean': mean_a + delta * n_b / n,
+            'min': np.fmin(left['min'], right['min']),
+            'max': np.fmax(left['max'], right['max']),
+            'm2': left['m2'].fillna(0) + right['m2'].fillna(0) + delta ** 2 * n_a * n_b / n,
+        })
+
+    def thresholds(self):
+        """
+        Summarizes the fitted groups.
+
+        Returns:
+            pd.DataFrame: One row per group with Count, Mean, Std, Min, Max,
+            Q1, Median, Q3, Lower_Fence and Upper_Fence.
+        """
+        if self.stats is None:
+            raise ValueError("fit_chunk has not been called")
+        if self._thresholds is None:
+            quartiles = self.sketch.quantiles([0.25, 0.5, 0.75])
+            table = pd.DataFrame({
+                'Count': self.stats['count'].astype('int64'),
+                'Mean': self.stats['mean'],
+                'Std': np.sqrt(self.stats['m2'] / (self.stats['count'] - 1).where(self.stats['count'] > 1)),
+                'Min': self.stats['min'],
+                'Max': self.stats['max'],
+                'Q1': quartiles[0.25],
+                'Median': quartiles[0.5],
+                'Q3': quartiles[0.75],
+            })
+            iqr = table['Q3'] - table['Q1']
+            table['Lower_Fence'] = table['Q1'] - self.iqr_multiplier * iqr
+            table['Upper_Fence'] = table['Q3'] + self.iqr_multiplier * iqr
+            table = table.reset_index()
+            self._thresholds = table.drop(columns='_all') if '_all' in table else table
+        return self._thresholds
+
+    def flag_chunk(self, chunk):
+        """
+        Returns the rows of a chunk that are z-score or IQR outliers.
+
+        Args:
+            chunk (pd.DataFrame): Rows with Date, the by dimensions and the measure's columns.
+
+        Returns:
+            pd.DataFrame: The outlying rows plus Z_Score, Z_Outlier and IQR_Outlier columns.
+        """
+        with span('flag'):
+            chunk = chunk[chunk['Date'].notna()]
+            values = measure_values(chunk, self.measure).to_numpy(dtype='float64')
+            finite = np.isfinite(values)
+            chunk, values = chunk[finite], values[finite]
+            thresholds = self.thresholds()
+            if self.group_columns:
+                keys = pd.concat(self._keys(chunk), axis=1)
+                matched = keys.merge(thresholds, on=self.group_columns, how='left')
+            else:
+                matched = thresholds.loc[np.zeros(len(chunk), dtype=np.int64)].reset_index(drop=True)
+
+            std = matched['Std'].to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where(std > 0, (values - matched['Mean'].to_numpy()) / std, 0.0)
+            slack = self.sketch.relative_accuracy * np.fmax(matched['Q1'].abs().to_numpy(), matched['Q3'].abs().to_numpy())
+            eligible = matched['Count'].to_numpy() >= self.min_group_rows
+            z_outlier = eligible & (np.abs(z) > self.z_threshold)
+            iqr_outlier = eligible & ((values < matched['Lower_Fence'].to_numpy() - slack) |
+                                      (values > matched['Upper_Fence'].to_numpy() + slack))
+
+            flagged = z_outlier | iqr_outlier
+            result = chunk[flagged].copy()
+            if self.measure not in result:
+                result[self.measure] = values[flagged]
+            result['Z_Score'] = z[flagged]
+            result['Z_Outlier'] = z_outlier[flagged]
+            result['IQR_Outlier'] = iqr_outlier[flagged]
+            return result
+
+
+def detect_outliers(file_path, measure='Actuals', by=('Product',), grain='All', chunk_rows=DEFAULT_CHUNK_ROWS,
+                    z_threshold=DEFAULT_Z_THRESHOLD, iqr_multiplier=DEFAULT_IQR_MULTIPLIER,
+                    relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_group_rows=DEFAULT_MIN_GROUP_ROWS):
+    """
+    Streams a sales file twice to find outlying rows per group.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        measure (str): Column to scan, or a key of DERIVED_MEASURES.
+        by (list): Dimensions defining the groups.
+        grain (str): Also group by period: 'Month', 'Quarter', 'Year' or 'All'.
+        chunk_rows (int): Rows per chunk; the file is loaded whole and
+            sliced into chunks if None.
+        z_threshold (float): |z| above which a row is a z-score outlier.
+        iqr_multiplier (float): Fence distance beyond Q1/Q3 in interquartile ranges.
+        relative_accuracy (float): Relative error of the sketched quartiles.
+        min_group_rows (int): Groups with fewer rows are never flagged.
+
+    Returns:
+        tuple: (outlying rows, per-group thresholds) DataFrames.
+    """
+    detector = OutlierDetector(measure, by, grain, z_threshold, iqr_multiplier, relative_accuracy, min_group_rows)
+    columns = ['Date'] + list(dict.fromkeys(list(by) + measure_columns(measure)))
+
+    if chunk_rows:
+        def chunks():
+            return iter_sales_chunks(file_path, columns, chunk_rows)
+    else:
+        df = load_sales_data(file_path)[columns]
+
+        def chunks():
+            return iter([df])
+
+    for chunk in chunks():
+        detector.fit_chunk(chunk)
+    if detector.stats is None:
+        raise ValueError(f"No rows in {file_path}")
+    flagged = [detector.flag_chunk(chunk) for chunk in chunks()]
+    return pd.concat(flagged, ignore_index=True), detector.thresholds()
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Flag z-score and IQR outliers per group in bounded memory.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--measure', default='Actuals',
+                        help='Actuals, Budget or Variance (default: Actuals)')
+    parser.add_argument('--by', default='Product',
+                        help='Comma-separated dimensions defining the groups (default: Product)')
+    parser.add_argument('--grain', choices=list(GRAINS), default='All',
+                        help='Also group by period (default: All, i.e. no period)')
+    parser.add_argument('--z-threshold', type=float, default=DEFAULT_Z_THRESHOLD,
+                        help=f'Absolute z-score counted as an outlier (default: {DEFAULT_Z_THRESHOLD})')
+    parser.add_argument('--iqr-multiplier', type=float, default=DEFAULT_IQR_MULTIPLIER,
+                        help=f'IQR fence multiplier (default: {DEFAULT_IQR_MULTIPLIER})')
+    parser.add_argument('--accuracy', type=float, default=DEFAULT_RELATIVE_ACCURACY,
+                        help=f'Relative error of the quantile sketch (default: {DEFAULT_RELATIVE_ACCURACY})')
+    parser.add_argument('--min-group-rows', type=int, default=DEFAULT_MIN_GROUP_ROWS,
+                        help=f'Never flag rows of smaller groups (default: {DEFAULT_MIN_GROUP_ROWS})')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Rows per chunk (default: {DEFAULT_CHUNK_ROWS:,})')
+    parser.add_argument('--output', '-o',
+                        help='Write the outlying rows to a .csv or .parquet file')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    by = [dimension for dimension in args.by.split(',') if dimension]
+    outliers, thresholds = detect_outliers(args.file_path, args.measure, by, args.grain, args.chunk_rows,
+                                           args.z_threshold, args.iqr_multiplier, args.accuracy, args.min_group_rows)
+
+    print(f"🔍 {len(outliers):,} outlying rows in {len(thresholds):,} groups "
+          f"({int(outliers['Z_Outlier'].sum()):,} by z-score, {int(outliers['IQR_Outlier'].sum()):,} by IQR)")
+    if len(outliers):
+        print(outliers.head(20).to_string(index=False))
+    if args.output:
+        if Path(args.output).suffix.lower() == '.parquet':
+            outliers.to_parquet(args.output, index=False)
+        else:
+            outliers.to_csv(args.output, index=False)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
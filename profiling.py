@@ -0,0 +1,218 @@
+"""
+Lightweight stage instrumentation shared by the generator and analyzer CLIs.
+
+Code marks named stages with ``with span('read_csv'):``. Spans nest, and
+each one records wall time, CPU time, the process's peak RSS as of the end
+of the stage, and how far the stage raised that peak. The OS only reports a
+lifetime high-water mark, so a stage that allocates less than an earlier one
+shows no growth even though it used memory. While
+profiling is disabled (the default), span() returns a shared no-op context
+manager, so instrumented code pays only for a function call.
+"""
+
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _NullSpan:
+    """Context manager used while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """One timed stage; records itself on the profiler when it exits."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._stack.append(self.name)
+        self.path = '/'.join(self.profiler._stack)
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.rss_start = peak_rss_mb()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall_end = time.perf_counter()
+        rss_end = peak_rss_mb()
+        self.profiler._stack.pop()
+        self.profiler.events.append({
+            'name': self.name,
+            'path': self.path,
+            'depth': self.path.count('/'),
+            'start': self.wall_start - self.profiler.origin,
+            'wall': wall_end - self.wall_start,
+            'cpu': time.process_time() - self.cpu_start,
+            'peak_rss_mb': rss_end,
+            'peak_growth_mb': rss_end - self.rss_start if rss_end is not None else None,
+        })
+        return False
+
+
+class Profiler:
+    """
+    Collects nested stage timings.
+
+    Args:
+        enabled (bool): When False, span() is a no-op.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.events = []
+        self._stack = []
+
+    def span(self, name):
+        """Returns a context manager timing the named stage."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def summary(self):
+        """
+        Aggregates events by stage path, in the order stages first started.
+
+        Returns:
+            list: Dicts with path, name, depth, calls, wall, cpu, peak_rss_mb (the
+                process peak at the end of the last call) and peak_growth_mb (the
+                most any call raised the process peak).
+        """
+        stages = {}
+        for event in sorted(self.events, key=lambda e: e['start']):
+            stage = stages.setdefault(event['path'], {
+                'path': event['path'], 'name': event['name'], 'depth': event['depth'],
+                'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_rss_mb': None, 'peak_growth_mb': None,
+            })
+            stage['calls'] += 1
+            stage['wall'] += event['wall']
+            stage['cpu'] += event['cpu']
+            if event['peak_rss_mb'] is not None:
+                stage['peak_rss_mb'] = max(stage['peak_rss_mb'] or 0.0, event['peak_rss_mb'])
+                stage['peak_growth_mb'] = max(stage['peak_growth_mb'] or 0.0, event['peak_growth_mb'])
+        return list(stages.values())
+
+    def report(self):
+        """Formats the stage summary as an indented text table."""
+        lines = [f"{'Stage':<40} {'Calls':>7} {'Wall (s)':>10} {'CPU (s)':>10} "
+                 f"{'Process peak at end (MB)':>25} {'Peak growth (MB)':>17}"]
+        for stage in self.summary():
+            label = '  ' * stage['depth'] + stage['name']
+            if stage['peak_rss_mb'] is not None:
+                rss, growth = f"{stage['peak_rss_mb']:.1f}", f"{stage['peak_growth_mb']:.1f}"
+            else:
+                rss = growth = 'n/a'
+            lines.append(f"{label:<40} {stage['calls']:>7} {stage['wall']:>10.3f} {stage['cpu']:>10.3f} "
+                         f"{rss:>25} {growth:>17}")
+        return '\n'.join(lines)
+
+    def trace(self):
+        """Returns the events in Chrome trace format (chrome://tracing, Perfetto)."""
+        return {'traceEvents': [
+            {'name': event['name'], 'ph': 'X', 'pid': 0, 'tid': 0,
+             'ts': event['start'] * 1e6, 'dur': event['wall'] * 1e6,
+             'args': {'cpu_s': event['cpu'], 'peak_rss_mb': event['peak_rss_mb'],
+                      'peak_growth_mb': event['peak_growth_mb']}}
+            for event in self.events
+        ]}
+
+    def dump(self, destination=None):
+        """
+        Writes the profile: a Chrome trace for *.json paths, the text report otherwise.
+
+        Args:
+            destination (str): Output path; None or '-' prints the report to stderr.
+        """
+        if destination in (None, '-'):
+            print(self.report(), file=sys.stderr)
+        elif destination.endswith('.json'):
+            with open(destination, 'w', encoding='utf-8') as f:
+                json.dump(self.trace(), f)
+        else:
+            with open(destination, 'w', encoding='utf-8') as f:
+                f.write(self.report() + '\n')
+
+
+_active = Profiler(enabled=False)
+
+
+def enable():
+    """Starts recording spans on a fresh process-wide profiler and returns it."""
+    global _active
+    _active = Profiler(enabled=True)
+    return _active
+
+
+def get_profiler():
+    """Returns the process-wide profiler."""
+    return _active
+
+
+def span(name):
+    """Times a named stage on the process-wide profiler (a no-op unless enabled)."""
+    return _active.span(name)
+
+
+_EXHAUSTED = object()
+
+
+def timed_iter(iterable, name):
+    """Yields from iterable, timing each fetch of the next item as a span."""
+    iterator = iter(iterable)
+    while True:
+        with span(name):
+            item = next(iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+class ProgressReporter:
+    """
+    Prints progress at most once per interval, plus once on completion.
+
+    Args:
+        total (int): Units of work expected.
+        interval (float): Minimum seconds between progress lines.
+        label (str): Text shown before the counts.
+    """
+
+    def __init__(self, total, interval=1.0, label='📊 Progress'):
+        self.total = total
+        self.interval = interval
+        self.label = label
+        self._last = float('-inf')
+
+    def update(self, done, note=''):
+        """Reports that done units are complete; prints only if the interval has elapsed or work is finished."""
+        now = time.monotonic()
+        if done < self.total and now - self._last < self.interval:
+            return
+        self._last = now
+        progress = (done / self.total) * 100 if self.total else 100.0
+        print(f"{self.label}: {done:,}/{self.total:,} ({progress:.1f}%){note}")
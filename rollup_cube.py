@@ -0,0 +1,376 @@
+"""
+Pre-materialized rollup cube over the sales schema.
+
+One scan of the raw rows builds a base table of Budget/Actuals sums and row
+counts per (Year, Month, every dimension present). Every other rollup
+(dimension subsets along the Category -> Product and Region -> Country ->
+State -> City hierarchies, plus Channel, at Month, Quarter, Year and All
+grains) is then aggregated from the smallest rollup already built, not from
+the rows. Slice and drill queries are answered from the smallest
+materialized rollup that still holds every dimension they need.
+"""
+
+import argparse
+import itertools
+from pathlib import Path
+
+import pandas as pd
+
+import profiling
+from analysis_cache import DEFAULT_CACHE_DIR, AnalysisCache
+from analyze_reg import DERIVED_MEASURES, DEFAULT_CHUNK_ROWS, iter_sales_chunks, load_sales_data
+from profiling import span
+
+# Dimension hierarchies, coarsest level first; levels missing from a file are skipped
+HIERARCHIES = {
+    'Product': ['Category', 'Product'],
+    'Geography': ['Region', 'Country', 'State', 'City'],
+    'Channel': ['Channel'],
+}
+
+# Summable measure columns picked up when present
+MEASURE_COLUMNS = ['Budget', 'Forecast', 'Actuals', 'Actual']
+
+# Time grains, finest first, with the period columns of each
+GRAINS = {
+    'Month': ['Year', 'Month'],
+    'Quarter': ['Year', 'Quarter'],
+    'Year': ['Year'],
+    'All': [],
+}
+
+
+def file_columns(file_path):
+    """
+    Reads the column names of a sales file without loading its rows.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+
+    Returns:
+        list: Column names.
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_path).names
+    if suffix == '.feather':
+        import pyarrow as pa
+        with pa.memory_map(str(file_path)) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+
+def default_rollups(columns):
+    """
+    Lists the dimension combinations worth materializing for a schema.
+
+    Every combination of one level (or none) from each hierarchy, where a
+    level implies the coarser levels above it, e.g. (Category, Product,
+    Region, Country).
+
+    Args:
+        columns (list): Columns of the source file.
+
+    Returns:
+        list: Tuples of dimension names, finest combination first.
+    """
+    options = []
+    for levels in HIERARCHIES.values():
+        present = [level for level in levels if level in columns]
+        options.append([tuple(present[:depth]) for depth in range(len(present) + 1)])
+    combos = [sum(choice, ()) for choice in itertools.product(*options)]
+    return sorted(set(combos), key=lambda dims: -len(dims))
+
+
+def period_keys(dates, grain):
+    """
+    Derives the period columns of a grain from a datetime series.
+
+    Args:
+        dates (pd.Series): Datetime values.
+        grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+
+    Returns:
+        list: Named integer series, one per period column of the grain.
+    """
+    dates = dates.dt
+    keys = {'Year': dates.year.rename('Year'), 'Quarter': dates.quarter.rename('Quarter'),
+            'Month': dates.month.rename('Month')}
+    return [keys[column] for column in GRAINS[grain]]
+
+
+def _coarsen_keys(table, grain):
+    """Returns the period key series that roll a Month/Quarter/Year table up to grain."""
+    if grain == 'Quarter' and 'Month' in table:
+        return [table['Year'], ((table['Month'] - 1) // 3 + 1).rename('Quarter')]
+    return [table[column] for column in GRAINS[grain]]
+
+
+def _can_roll_up(source_grain, grain):
+    """Whether a rollup at source_grain can be re-aggregated to grain."""
+    grains = list(GRAINS)
+    return grains.index(source_grain) <= grains.index(grain)
+
+
+class RollupCube:
+    """
+    Materialized rollups of summable measures over dimension subsets and time grains.
+
+    Args:
+        rollups (dict): (grain, dimensions) -> DataFrame with the grain's
+            period columns, the dimensions, the measures and Count.
+        measures (list): Measure columns summed in every rollup.
+    """
+
+    def __init__(self, rollups, measures):
+        self.rollups = rollups
+        self.measures = measures
+
+    @classmethod
+    def from_base(cls, base, dimensions, measures, rollups=None):
+        """
+        Builds every rollup from a (Year, Month, dimensions) base aggregate.
+
+        Each rollup is aggregated from the smallest one already built that
+        contains its dimensions, so only the base is derived from raw rows.
+
+        Args:
+            base (pd.DataFrame): Output of aggregate_base.
+            dimensions (list): Dimension columns of the base.
+            measures (list): Measure columns of the base.
+            rollups (list): Dimension tuples to materialize (default_rollups if None).
+
+        Returns:
+            RollupCube: The built cube.
+        """
+        built = {('Month', tuple(dimensions)): base}
+        with span('rollup'):
+            for dims in rollups if rollups is not None else default_rollups(dimensions):
+                for grain in GRAINS:
+                    if (grain, dims) not in built:
+                        source = cls._smallest(built, set(dims), grain)
+                        built[(grain, dims)] = cls._aggregate(source, grain, dims, measures + ['Count'])
+        return cls(built, measures)
+
+    @staticmethod
+    def _smallest(rollups, dimensions, grain):
+        """Returns the smallest rollup that holds the dimensions at grain or finer."""
+        candidates = [table for (table_grain, dims), table in rollups.items()
+                      if dimensions <= set(dims) and _can_roll_up(table_grain, grain)]
+        if not candidates:
+            raise ValueError(f"No rollup holds {sorted(dimensions)} at {grain} grain")
+        return min(candidates, key=len)
+
+    @staticmethod
+    def _aggregate(table, grain, dimensions, columns):
+        """Re-aggregates a rollup to grain and dimensions."""
+        keys = _coarsen_keys(table, grain) + [table[dimension] for dimension in dimensions]
+        if not keys:
+            return table[columns].sum().to_frame().T
+        return table.groupby(keys, observed=True, dropna=False)[columns].sum().reset_index()
+
+    def query(self, by=(), grain='All', where=None, measures=None):
+        """
+        Answers a slice/drill query from the smallest sufficient rollup.
+
+        Args:
+            by (list): Dimensions to break the result down by.
+            grain (str): 'Month', 'Quarter', 'Year' or 'All'.
+            where (dict): Dimension -> value (or list of values) filters.
+            measures (list): Measures to return; stored measures, Count, or
+                keys of DERIVED_MEASURES. Defaults to every stored measure and Count.
+
+        Returns:
+            pd.DataFrame: Period columns of the grain, the by dimensions and the measures.
+        """
+        if grain not in GRAINS:
+            raise ValueError(f"Unknown grain: {grain}")
+        by = list(by)
+        where = where or {}
+        measures = measures or self.measures + ['Count']
+        table = self._smallest(self.rollups, set(by) | set(where), grain)
+
+        for dimension, value in where.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            table = table[table[dimension].isin(values)]
+
+        stored = list(dict.fromkeys(
+            column for measure in measures for column in DERIVED_MEASURES.get(measure, (measure,))))
+        result = self._aggregate(table, grain, by, stored)
+        for measure in measures:
+            if measure in DERIVED_MEASURES:
+                minuend, subtrahend = DERIVED_MEASURES[measure]
+                result[measure] = result[minuend] - result[subtrahend]
+        return result[GRAINS[grain] + by + list(measures)]
+
+    def describe(self):
+        """
+        Lists the materialized rollups and their sizes.
+
+        Returns:
+            pd.DataFrame: Grain, Dimensions and Rows per rollup, largest first.
+        """
+        rows = [{'Grain': grain, 'Dimensions': ', '.join(dims) or '(total)', 'Rows': len(table)}
+                for (grain, dims), table in self.rollups.items()]
+        return pd.DataFrame(rows).sort_values('Rows', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def aggregate_base(df, dimensions, measures):
+    """
+    Sums measures and counts rows per (Year, Month, dimensions) in one pass.
+
+    Rows without a date (such as the blank trailing lines of SAMPLE300.csv)
+    are skipped; rows with a missing dimension value are kept under a null key.
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        dimensions (list): Dimension columns.
+        measures (list): Numeric columns to sum.
+
+    Returns:
+        pd.DataFrame: Columns Year, Month, <dimensions>, <measures>, Count.
+    """
+    with span('aggregate'):
+        if df['Date'].isna().any():
+            df = df[df['Date'].notna()]
+        dates = df['Date'].dt
+        keys = [dates.year.rename('Year'), dates.month.rename('Month')] + [df[dimension] for dimension in dimensions]
+        grouped = df.groupby(keys, observed=True, dropna=False)
+        base = grouped[measures].sum()
+        base['Count'] = grouped.size()
+        return base.reset_index()
+
+
+def build_cube(file_path, chunk_rows=None, rollups=None):
+    """
+    Builds a RollupCube from a sales file with a single scan of its rows.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        chunk_rows (int): Stream the file in chunks of this many rows instead
+            of loading it whole.
+        rollups (list): Dimension tuples to materialize (default_rollups if None).
+
+    Returns:
+        RollupCube: The built cube.
+    """
+    columns = file_columns(file_path)
+    dimensions = [level for levels in HIERARCHIES.values() for level in levels if level in columns]
+    measures = [column for column in MEASURE_COLUMNS if column in columns]
+
+    if chunk_rows:
+        base = None
+        for chunk in iter_sales_chunks(file_path, ['Date'] + dimensions + measures, chunk_rows):
+            partial = aggregate_base(chunk, dimensions, measures)
+            if base is not None:
+                with span('fold'):
+                    partial = pd.concat([base, partial], ignore_index=True)
+                    partial = partial.groupby(['Year', 'Month'] + dimensions, observed=True,
+                                              dropna=False)[measures + ['Count']].sum().reset_index()
+            base = partial
+        if base is None:
+            base = aggregate_base(pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'),
+                                                **{d: pd.Series(dtype=str) for d in dimensions},
+                                                **{m: pd.Series(dtype='float64') for m in measures}}),
+                                  dimensions, measures)
+    else:
+        base = aggregate_base(load_sales_data(file_path), dimensions, measures)
+
+    return RollupCube.from_base(base, dimensions, measures, rollups)
+
+
+def build_cube_cached(file_path, cache, chunk_rows=None):
+    """
+    Builds a RollupCube through an AnalysisCache, scanning the file only on a miss.
+
+    Args:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+        cache (AnalysisCache): Cache to read from and populate.
+        chunk_rows (int): Stream the file in chunks on a miss.
+
+    Returns:
+        RollupCube: The built or cached cube.
+    """
+    key = cache.key(cache.file_key(file_path), artifact='rollup_cube')
+    cube = cache.get(key)
+    if cube is None:
+        cube = build_cube(file_path, chunk_rows=chunk_rows)
+        cache.put(key, cube)
+    return cube
+
+
+def _parse_where(items):
+    """Parses repeated 'Dimension=value[|value...]' arguments into a filter dict."""
+    where = {}
+    for item in items or []:
+        dimension, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Filters must look like Dimension=value, got: {item}")
+        values = value.split('|')
+        where[dimension] = values if len(values) > 1 else values[0]
+    return where
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Build a rollup cube over a sales file and query it.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--by', default='',
+                        help='Comma-separated dimensions to break down by, e.g. Region,Country')
+    parser.add_argument('--grain', choices=list(GRAINS), default='All',
+                        help='Time grain of the result (default: All)')
+    parser.add_argument('--where', action='append', metavar='DIM=VALUE',
+                        help="Filter on a dimension; separate alternatives with '|'. Repeatable")
+    parser.add_argument('--measure', default=None,
+                        help='Comma-separated measures, e.g. Actuals,Variance,Count (default: all)')
+    parser.add_argument('--describe', action='store_true',
+                        help='List the materialized rollups instead of querying')
+    parser.add_argument('--chunk-rows', type=int, nargs='?', const=DEFAULT_CHUNK_ROWS,
+                        help='Stream the file in chunks of N rows while building')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse the cube for unchanged files')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Cache directory (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--output', '-o',
+                        help='Also write the result to a .csv or .parquet file')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+
+    try:
+        where = _parse_where(args.where)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.profile:
+        profiling.enable()
+
+    with span('build_cube'):
+        if args.cache:
+            cube = build_cube_cached(args.file_path, AnalysisCache(args.cache_dir), chunk_rows=args.chunk_rows)
+        else:
+            cube = build_cube(args.file_path, chunk_rows=args.chunk_rows)
+
+    if args.describe:
+        result = cube.describe()
+    else:
+        by = [dimension for dimension in args.by.split(',') if dimension]
+        measures = [measure for measure in args.measure.split(',') if measure] if args.measure else None
+        with span('query'):
+            result = cube.query(by, args.grain, where, measures)
+
+    print(result.to_string(index=False))
+    if args.output:
+        if Path(args.output).suffix.lower() == '.parquet':
+            result.to_parquet(args.output, index=False)
+        else:
+            result.to_csv(args.output, index=False)
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""AIProductGenerator against a local stub of the Ollama /api/generate endpoint"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generate_sample_data import AIProductGenerator, CatalogCache
+
+REPLY_DELAY = 0.3
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers each prompt with a small catalog after REPLY_DELAY, or with bad JSON for 'broken' businesses"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        time.sleep(REPLY_DELAY)
+        business_type = body['prompt'].split('"')[1]
+        if 'broken' in business_type:
+            response = 'not json'
+        else:
+            categories = [f'{business_type} category {i}' for i in range(3)]
+            response = json.dumps({
+                'categories': categories,
+                'products': [{'name': f'{business_type} product {i}', 'category': categories[i % 3]}
+                             for i in range(6)]
+            })
+        data = json.dumps({'response': response}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def llm_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _generator(server, cache=None):
+    url = f'http://127.0.0.1:{server.server_port}/api/generate'
+    return AIProductGenerator(llm_url=url, cache=cache, max_concurrency=8)
+
+
+def test_requests_are_dispatched_concurrently(llm_server):
+    business_types = [f'vertical {i}' for i in range(8)]
+    start = time.perf_counter()
+    catalogs = _generator(llm_server).generate_catalogs(business_types)
+    elapsed = time.perf_counter() - start
+
+    assert len(llm_server.requests) == 8
+    # Serial dispatch would take 8 * REPLY_DELAY
+    assert elapsed < 4 * REPLY_DELAY
+    assert catalogs['vertical 3'][0][0] == 'vertical 3 product 0'
+
+
+def test_second_call_is_served_from_cache(llm_server, tmp_path):
+    business_types = ['coffee roaster', 'Coffee  Roaster!', 'bike shop']
+    first = _generator(llm_server, CatalogCache(str(tmp_path))).generate_catalogs(business_types)
+    # Business types that normalize to the same text share one request
+    assert len(llm_server.requests) == 2
+
+    llm_server.requests.clear()
+    second = _generator(llm_server, CatalogCache(str(tmp_path))).generate_catalogs(business_types)
+    assert llm_server.requests == []
+    assert second == first
+
+
+def test_expired_catalogs_are_requested_again(llm_server, tmp_path):
+    _generator(llm_server, CatalogCache(str(tmp_path))).generate_catalogs(['bike shop'])
+    time.sleep(0.1)
+
+    llm_server.requests.clear()
+    expired = CatalogCache(str(tmp_path), ttl_hours=0.05 / 3600)
+    _generator(llm_server, expired).generate_catalogs(['bike shop'])
+    assert len(llm_server.requests) == 1
+
+
+def test_bad_reply_falls_back_for_that_business_type_only(llm_server, tmp_path):
+    generator = _generator(llm_server, CatalogCache(str(tmp_path)))
+    catalogs = generator.generate_catalogs(['bike shop', 'broken restaurant'])
+
+    assert catalogs['bike shop'][0][0] == 'bike shop product 0'
+    assert catalogs['broken restaurant'] == generator._generate_smart_fallback('broken restaurant')
+    # The fallback is not cached, so the broken type is asked again next time
+    llm_server.requests.clear()
+    generator.generate_catalogs(['bike shop', 'broken restaurant'])
+    assert len(llm_server.requests) == 1
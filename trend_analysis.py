@@ -0,0 +1,364 @@
+"""
+Rolling-window trend analysis for every member of a dimension at once.
+
+Sales are aggregated per (period, member) and pivoted into a dense
+(periods x members) matrix with a complete period index. Rolling means,
+exponential moving averages, period-over-period growth and least-squares
+slopes are then computed column-wise over the whole matrix, with no
+per-product loop. A TrendState keeps just enough history (the last window
+of values and the current EMA) to fold in each new period without
+recomputing the series.
+"""
+
+import argparse
+import copy
+import os
+import pickle
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import profiling
+from analyze_reg import DEFAULT_CHUNK_ROWS, aggregate_by_month, aggregate_by_month_chunked, load_sales_data
+from date_range_index import aggregate_by_day
+from profiling import span
+
+DEFAULT_WINDOW = 3
+DEFAULT_SPAN = 3
+
+# Slope per period, relative to the rolling mean, beyond which a series is trending
+DEFAULT_TREND_THRESHOLD = 0.02
+
+FREQUENCIES = ['month', 'day']
+
+
+def build_series(df, dimension='Product', measure='Actuals', freq='month'):
+    """
+    Pivots sales rows into a dense (periods x members) matrix.
+
+    Args:
+        df (pd.DataFrame): Rows with a datetime 'Date' column.
+        dimension (str): Column whose members become series.
+        measure (str): Measure to sum, or a key of DERIVED_MEASURES.
+        freq (str): 'month' or 'day'.
+
+    Returns:
+        pd.DataFrame: PeriodIndex rows, one column per member; periods
+        without sales are 0.
+    """
+    if freq == 'month':
+        return series_from_monthly(aggregate_by_month(df, dimension, measure), dimension, measure)
+    if freq == 'day':
+        return series_from_daily(aggregate_by_day(df, dimension, measure), dimension, measure)
+    raise ValueError(f"Unknown frequency: {freq}")
+
+
+def series_from_monthly(monthly, dimension='Product', measure='Actuals'):
+    """Pivots an aggregate_by_month table into a dense (months x members) matrix."""
+    periods = pd.PeriodIndex.from_fields(year=monthly['Year'], month=monthly['Month'], freq='M')
+    return _densify(periods, monthly[dimension], monthly[measure], 'M')
+
+
+def series_from_daily(daily, dimension='Product', measure='Actuals'):
+    """Pivots an aggregate_by_day table into a dense (days x members) matrix."""
+    return _densify(pd.PeriodIndex(daily['Date'], freq='D'), daily[dimension], daily[measure], 'D')
+
+
+def _densify(periods, members, values, freq):
+    """Scatters (period, member, value) triples into a zero-filled matrix over the full period range."""
+    with span('pivot'):
+        member_codes, member_names = pd.factorize(members, sort=True)
+        if len(periods):
+            index = pd.period_range(periods.min(), periods.max(), freq=freq)
+            period_codes = periods.asi8 - index[0].ordinal
+        else:
+            index = pd.PeriodIndex([], freq=freq)
+            period_codes = np.zeros(0, dtype=np.int64)
+        matrix = np.zeros((len(index), len(member_names)))
+        np.add.at(matrix, (period_codes, member_codes), np.asarray(values, dtype='float64'))
+        return pd.DataFrame(matrix, index=index, columns=pd.Index(member_names, name=members.name))
+
+
+def slope_weights(window):
+    """Weights whose dot product with a window of values is its least-squares slope per period."""
+    x = np.arange(window, dtype='float64')
+    centered = x - x.mean()
+    return centered / (centered ** 2).sum()
+
+
+def compute_trends(series, window=DEFAULT_WINDOW, span_periods=DEFAULT_SPAN, threshold=DEFAULT_TREND_THRESHOLD):
+    """
+    Computes trend metrics for every member and period.
+
+    Args:
+        series (pd.DataFrame): Output of build_series.
+        window (int): Periods in the rolling mean and slope window.
+        span_periods (int): Span of the exponential moving average.
+        threshold (float): Relative slope beyond which a series is trending.
+
+    Returns:
+        dict: Name -> (periods x members) DataFrame, for Value, Rolling_Mean,
+        EMA, Growth_Pct, Slope and Trend.
+    """
+    if window < 2:
+        raise ValueError(f"window must be at least 2, got {window}")
+    with span('trends'):
+        values = series.to_numpy()
+        rolling_mean = series.rolling(window, min_periods=window).mean()
+        ema = series.ewm(span=span_periods, adjust=False).mean()
+
+        previous = np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]]) if len(values) else values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(previous != 0, (values - previous) / np.abs(previous) * 100, np.nan)
+
+        slope = np.full(values.shape, np.nan)
+        if len(values) >= window:
+            slope[window - 1:] = sliding_window_view(values, window, axis=0) @ slope_weights(window)
+
+        return {
+            'Value': series,
+            'Rolling_Mean': rolling_mean,
+            'EMA': ema,
+            'Growth_Pct': pd.DataFrame(growth, index=series.index, columns=series.columns),
+            'Slope': pd.DataFrame(slope, index=series.index, columns=series.columns),
+            'Trend': pd.DataFrame(_classify(slope, rolling_mean.to_numpy(), threshold),
+                                  index=series.index, columns=series.columns),
+        }
+
+
+def _classify(slope, level, threshold):
+    """Labels slopes as up, flat or down relative to the series level."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(level != 0, slope / np.abs(level), np.nan)
+    labels = np.where(relative > threshold, 'up', np.where(relative < -threshold, 'down', 'flat'))
+    return np.where(np.isnan(relative), None, labels)
+
+
+def latest_trends(trends):
+    """
+    Collects the metrics of the most recent period, one row per member.
+
+    Args:
+        trends (dict): Output of compute_trends.
+
+    Returns:
+        pd.DataFrame: Member column plus Period and one column per metric.
+    """
+    series = trends['Value']
+    if series.empty:
+        return pd.DataFrame(columns=[series.columns.name or 'Member', 'Period'] + list(trends))
+    frame = pd.DataFrame({name: table.iloc[-1] for name, table in trends.items()})
+    frame.insert(0, 'Period', str(series.index[-1]))
+    return frame.rename_axis(series.columns.name or 'Member').reset_index()
+
+
+@dataclass
+class TrendState:
+    """
+    Trailing history needed to extend trends one period at a time.
+
+    Attributes:
+        freq (str): Pandas period frequency ('M' or 'D').
+        window (int): Rolling window length.
+        span_periods (int): EMA span.
+        threshold (float): Relative slope beyond which a series is trending.
+        last_period (pd.Period): Most recent period folded in.
+        members (pd.Index): Member names, one per column.
+        buffer (np.ndarray): (window x members) values of the last window periods.
+        ema (np.ndarray): Current EMA per member.
+        filled (int): Periods folded in so far, capped at window.
+    """
+    freq: str
+    window: int
+    span_periods: int
+    threshold: float
+    last_period: pd.Period
+    members: pd.Index
+    buffer: np.ndarray
+    ema: np.ndarray
+    filled: int
+
+    @classmethod
+    def from_series(cls, series, window=DEFAULT_WINDOW, span_periods=DEFAULT_SPAN,
+                    threshold=DEFAULT_TREND_THRESHOLD):
+        """Captures the trailing state of a full series (see compute_trends)."""
+        if series.empty:
+            raise ValueError("Cannot start a trend state from an empty series")
+        values = series.to_numpy()
+        buffer = np.full((window, values.shape[1]), np.nan)
+        tail = values[-window:]
+        buffer[window - len(tail):] = tail
+        ema = series.ewm(span=span_periods, adjust=False).mean().to_numpy()[-1]
+        return cls(series.index.freqstr[0], window, span_periods, threshold, series.index[-1],
+                   series.columns, buffer, ema, min(len(values), window))
+
+    def update(self, period, values):
+        """
+        Folds one new period into the state and returns its metrics.
+
+        Args:
+            period (pd.Period): The period, after last_period; skipped periods count as 0.
+            values (pd.Series): Measure per member for the period; new members
+                start with a zero history.
+
+        Returns:
+            pd.DataFrame: Same layout as latest_trends.
+        """
+        if period <= self.last_period:
+            raise ValueError(f"Period {period} is not after {self.last_period}")
+        new_members = values.index.difference(self.members)
+        if len(new_members):
+            self.members = self.members.append(new_members)
+            history = np.where(np.isnan(self.buffer[:, :1]), np.nan, 0.0)
+            self.buffer = np.hstack([self.buffer, np.repeat(history, len(new_members), axis=1)])
+            self.ema = np.concatenate([self.ema, np.zeros(len(new_members))])
+
+        # Periods skipped since the last update had no sales
+        gap = (period - self.last_period).n - 1
+        row = values.reindex(self.members, fill_value=0).to_numpy(dtype='float64')
+        for step in [np.zeros(len(self.members))] * gap + [row]:
+            previous = self.buffer[-1].copy()
+            self.buffer = np.vstack([self.buffer[1:], step])
+            alpha = 2 / (self.span_periods + 1)
+            self.ema = alpha * step + (1 - alpha) * self.ema
+            self.filled = min(self.filled + 1, self.window)
+        self.last_period = period
+
+        complete = self.filled >= self.window
+        rolling_mean = self.buffer.mean(axis=0) if complete else np.full(len(self.members), np.nan)
+        slope = self.buffer.T @ slope_weights(self.window) if complete else np.full(len(self.members), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(previous != 0, (row - previous) / np.abs(previous) * 100, np.nan)
+
+        return pd.DataFrame({
+            self.members.name or 'Member': self.members,
+            'Period': str(period),
+            'Value': row,
+            'Rolling_Mean': rolling_mean,
+            'EMA': self.ema,
+            'Growth_Pct': growth,
+            'Slope': slope,
+            'Trend': _classify(slope, rolling_mean, self.threshold),
+        })
+
+
+def update_trends(series, state_path, window=DEFAULT_WINDOW, span_periods=DEFAULT_SPAN,
+                  threshold=DEFAULT_TREND_THRESHOLD):
+    """
+    Extends the trends saved in state_path with the periods of series after its last period.
+
+    The first run (or a run whose state does not match the settings)
+    computes the full series and saves the trailing state. Only complete
+    periods are saved: the last period of series may still be receiving
+    rows, so it is folded into a copy of the state on every run and saved
+    once a later period appears. A run with no new period therefore leaves
+    the state unchanged and still reflects late rows of the current period.
+
+    Args:
+        series (pd.DataFrame): Output of build_series.
+        state_path (str): Pickled TrendState to read and update.
+        window (int): Rolling window length.
+        span_periods (int): EMA span.
+        threshold (float): Relative slope beyond which a series is trending.
+
+    Returns:
+        pd.DataFrame: Metrics of the latest period, as latest_trends.
+    """
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path, 'rb') as state_file:
+            state = pickle.load(state_file)
+        if not isinstance(state, TrendState) or (
+                state.freq, state.window, state.span_periods, state.threshold) != (
+                series.index.freqstr[0], window, span_periods, threshold):
+            state = None
+
+    # The saved state must end before the (open) last period of the series
+    if state is not None and (series.empty or series.index[-1] <= state.last_period):
+        state = None
+
+    if state is None:
+        latest = latest_trends(compute_trends(series, window, span_periods, threshold))
+        if len(series) < 2:
+            return latest
+        state = TrendState.from_series(series.iloc[:-1], window, span_periods, threshold)
+    else:
+        last_period = series.index[-1]
+        with span('update'):
+            completed = series.index[(series.index > state.last_period) & (series.index < last_period)]
+            for period in completed:
+                state.update(period, series.loc[period])
+            latest = copy.deepcopy(state).update(last_period, series.loc[last_period])
+        if not len(completed):
+            return latest
+
+    with open(state_path, 'wb') as state_file:
+        pickle.dump(state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return latest
+
+
+def main():
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description='Rolling, exponential and slope trends for every product.')
+    parser.add_argument('file_path', help='Sales file (.csv, .parquet or .feather)')
+    parser.add_argument('--dimension', default='Product',
+                        help='Column whose members are trended (default: Product)')
+    parser.add_argument('--measure', default='Actuals',
+                        help='Actuals, Budget or Variance (default: Actuals)')
+    parser.add_argument('--freq', choices=FREQUENCIES, default='month',
+                        help='Series frequency (default: month)')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                        help=f'Rolling window in periods (default: {DEFAULT_WINDOW})')
+    parser.add_argument('--span', type=int, default=DEFAULT_SPAN,
+                        help=f'EMA span in periods (default: {DEFAULT_SPAN})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_TREND_THRESHOLD,
+                        help=f'Slope per period, relative to the rolling mean, counted as a trend (default: {DEFAULT_TREND_THRESHOLD})')
+    parser.add_argument('--top', type=int, default=5, metavar='N',
+                        help='Members to list with the steepest rise and fall (default: 5)')
+    parser.add_argument('--state',
+                        help='Incremental mode: fold only periods after those recorded in this state file')
+    parser.add_argument('--chunk-rows', type=int, nargs='?', const=DEFAULT_CHUNK_ROWS,
+                        help='Stream the file in chunks of N rows (monthly series only)')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record per-stage wall/CPU time and peak RSS; print the report to stderr, '
+                             'or write it to PATH (*.json for a Chrome trace)')
+    args = parser.parse_args()
+    if args.chunk_rows and args.freq != 'month':
+        parser.error('--chunk-rows is only supported with --freq month')
+
+    if args.profile:
+        profiling.enable()
+
+    if args.chunk_rows:
+        monthly = aggregate_by_month_chunked(args.file_path, args.dimension, args.measure, args.chunk_rows)
+        series = series_from_monthly(monthly, args.dimension, args.measure)
+    else:
+        series = build_series(load_sales_data(args.file_path), args.dimension, args.measure, args.freq)
+
+    if args.state:
+        latest = update_trends(series, args.state, args.window, args.span, args.threshold)
+    else:
+        latest = latest_trends(compute_trends(series, args.window, args.span, args.threshold))
+
+    if latest.empty:
+        print("No data to trend")
+    else:
+        print(f"📈 {args.measure} trends by {args.dimension} as of {latest['Period'].iloc[0]} "
+              f"({(latest['Trend'] == 'up').sum()} up, {(latest['Trend'] == 'down').sum()} down, "
+              f"{(latest['Trend'] == 'flat').sum()} flat)")
+        relative = latest['Slope'] / latest['Rolling_Mean'].abs()
+        columns = [latest.columns[0], 'Value', 'Rolling_Mean', 'EMA', 'Growth_Pct', 'Slope', 'Trend']
+        with pd.option_context('display.float_format', '{:,.2f}'.format):
+            print("\nSteepest rise:")
+            print(latest.loc[relative.nlargest(args.top).index, columns].to_string(index=False))
+            print("\nSteepest fall:")
+            print(latest.loc[relative.nsmallest(args.top).index, columns].to_string(index=False))
+
+    if args.profile:
+        profiling.get_profiler().dump(args.profile)
+
+
+if __name__ == "__main__":
+    main()